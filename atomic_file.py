@@ -0,0 +1,53 @@
+"""Atomic file replacement.
+
+Files are written under a temporary name next to their target and renamed
+over it, so readers see either the old file or the new one, never half of
+one. Temporary names include the process and thread, so concurrent writers
+(parallel workers, watch mode) never share one.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def temp_path_for(path, hidden=False):
+    """Temporary name for a file that will replace path, unique to this thread"""
+    path = Path(path)
+    prefix = "." if hidden else ""
+    return path.with_name(f"{prefix}{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """Open path for writing; it is replaced only once the block finishes without an error"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temp_path_for(path)
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+
+def load_json(path, version):
+    """A JSON object written by save_json, or None when missing, unreadable or of another version"""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != version:
+        return None
+    return data
+
+
+def save_json(path, version, data, indent=None):
+    """Write a JSON object with a version number, atomically"""
+    with atomic_write(path) as f:
+        json.dump(dict(data, version=version), f, indent=indent)
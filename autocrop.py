@@ -0,0 +1,161 @@
+"""Automatic crop detection.
+
+A handful of frames spread over a clip are decoded as greyscale with a fast
+input seek (ffmpeg only decodes from the keyframe before each timestamp, not
+the whole file). A pixel is picture content if it is brighter than black in
+any sample; the crop is the black border around the rows and columns that
+contain content.
+
+Clips from the same camera at the same resolution have the same borders, so
+detected crops are cached per camera model and resolution in CropProfiles
+and a large batch only samples the first clip of each profile. Clips whose
+camera cannot be identified are always sampled.
+"""
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from atomic_file import load_json, save_json
+
+PROFILES_VERSION = 1
+
+# Frames sampled per clip, spread evenly between its start and end
+SAMPLE_COUNT = 6
+
+# Luma above this counts as picture; black is 16 in limited range video, plus compression noise
+BLACK_THRESHOLD = 32
+
+# A row or column is content once this share of its pixels is brighter than black
+MIN_CONTENT_FRACTION = 0.02
+
+# Borders leaving less than this share of the frame are treated as a dark clip, not a border
+MIN_PICTURE_FRACTION = 0.25
+
+
+def sample_times(duration, count=SAMPLE_COUNT):
+    """Timestamps of count samples, avoiding the very start and end of the clip"""
+    if not duration or duration <= 0:
+        return [0.0]
+    return [duration * (i + 1) / (count + 1) for i in range(count)]
+
+
+def sample_frames(ffmpeg_path, input_file, width, height, duration, count=SAMPLE_COUNT, startupinfo=None):
+    """Decode count greyscale frames of width x height from a clip, as bytes"""
+    frames = []
+    for timestamp in sample_times(duration, count):
+        cmd = [
+            ffmpeg_path, "-hide_banner", "-v", "error",
+            "-ss", f"{timestamp:.3f}", "-i", str(input_file),
+            "-map", "0:v:0", "-frames:v", "1",
+            "-f", "rawvideo", "-pix_fmt", "gray", "pipe:1"
+        ]
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                                startupinfo=startupinfo)
+        # A seek past the last keyframe can come back empty; the other samples still count
+        if result.returncode == 0 and len(result.stdout) >= width * height:
+            frames.append(result.stdout[:width * height])
+    if not frames:
+        raise Exception(f"Could not decode any frames from {os.path.basename(str(input_file))}")
+    return frames
+
+
+def content_counts(frames, width, height, threshold=BLACK_THRESHOLD):
+    """Per row and per column, how many pixels are brighter than black in any frame"""
+    if np is not None:
+        stack = np.stack([np.frombuffer(frame, dtype=np.uint8, count=width * height) for frame in frames])
+        bright = stack.max(axis=0).reshape(height, width) > threshold
+        return bright.sum(axis=1).tolist(), bright.sum(axis=0).tolist()
+
+    # Without numpy: map pixels to 0/1 with bytes.translate and OR the frames together as big integers
+    table = bytes(1 if value > threshold else 0 for value in range(256))
+    union = 0
+    for frame in frames:
+        union |= int.from_bytes(frame[:width * height].translate(table), "big")
+    mask = union.to_bytes(width * height, "big")
+    rows = [mask[row * width:(row + 1) * width].count(1) for row in range(height)]
+    columns = [mask[column::width].count(1) for column in range(width)]
+    return rows, columns
+
+
+def _border(counts, minimum):
+    """Lines before the first one with content, and after the last"""
+    content = [i for i, count in enumerate(counts) if count >= minimum]
+    if not content:
+        return None
+    return content[0], len(counts) - 1 - content[-1]
+
+
+def detect_crop(frames, width, height, threshold=BLACK_THRESHOLD):
+    """(top, bottom, left, right) black border of sampled frames; (0, 0, 0, 0) when there is none"""
+    rows, columns = content_counts(frames, width, height, threshold)
+    vertical = _border(rows, max(1, width * MIN_CONTENT_FRACTION))
+    horizontal = _border(columns, max(1, height * MIN_CONTENT_FRACTION))
+    if vertical is None or horizontal is None:
+        return (0, 0, 0, 0)
+
+    top, bottom, left, right = even_crop(vertical + horizontal)
+    if (height - top - bottom < height * MIN_PICTURE_FRACTION
+            or width - left - right < width * MIN_PICTURE_FRACTION):
+        return (0, 0, 0, 0)
+    return (top, bottom, left, right)
+
+
+def even_crop(crop):
+    """Crop values rounded up to even numbers, so the cropped frame still fits 4:2:0 chroma"""
+    return tuple(value + value % 2 if value > 0 else value for value in crop)
+
+
+def format_crop(crop):
+    return ":".join(str(value) for value in crop)
+
+
+def profile_key(camera, width, height):
+    """Cache key of a camera model and resolution, or None when the camera is unknown"""
+    if not camera:
+        return None
+    return f"{camera}|{width}x{height}"
+
+
+class CropProfiles:
+    """Detected crops by camera profile, kept in a JSON file"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._profiles = {}
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        data = load_json(self.path, PROFILES_VERSION)
+        if data:
+            self._profiles = data.get("profiles", {})
+
+    def save(self):
+        """Write the profiles if they changed, atomically"""
+        with self._lock:
+            if not self._dirty:
+                return
+            save_json(self.path, PROFILES_VERSION, {"profiles": self._profiles}, indent=2)
+            self._dirty = False
+
+    def get(self, key):
+        """Cached crop for a profile, or None"""
+        with self._lock:
+            entry = self._profiles.get(key) if key else None
+        return tuple(entry["crop"]) if entry else None
+
+    def set(self, key, crop, source=None):
+        if not key:
+            return
+        with self._lock:
+            self._profiles[key] = {"crop": list(crop), "source": str(source) if source else None,
+                                   "detected": time.time()}
+            self._dirty = True
@@ -0,0 +1,427 @@
+"""Cropperview benchmarks.
+
+tiers runs the processing pipeline on a reference clip once per encoder tier
+and reports encoding speed and output size:
+
+    python benchmark.py tiers reference.mp4
+    python benchmark.py tiers reference.mp4 --tiers proxy review --json tiers.json
+
+suite generates synthetic clips (ffmpeg testsrc2) and runs each pipeline
+configuration on them: fused vs two-pass vs streamed, serial vs parallel and
+the combine methods. Each run happens in its own process and reports wall
+time, fps, peak RSS, bytes written to the temp folder and output size:
+
+    python benchmark.py suite --json report.json
+    python benchmark.py suite --resolutions 1920x1080 --durations 60 --baseline report.json
+
+remap times the numpy engine's remap kernel on the Y plane of random frames,
+nearest and linear, single-threaded and on a thread pool, against a plain
+NumPy reference (one fancy-index gather; float64 interpolation for linear).
+It reports megapixels per second, the speedup over the reference and the
+largest difference from it:
+
+    python benchmark.py remap
+    python benchmark.py remap --resolutions 2880x2160 --frames 50 --threads 8
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows: peak RSS is not reported
+
+from pipeline import CropperviewPipeline, DEFAULT_SETTINGS, ENCODER_TIERS
+from remap_kernel import INTERPOLATIONS, RemapKernel, linear_index
+from superview import generate_maps, source_columns
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Settings every suite run starts from: nothing cached, one worker
+SUITE_BASE_SETTINGS = {
+    "combine_videos": False,
+    "max_workers": 1,
+    "result_cache": False,
+    "resume": False,
+    "scan_index": False,
+    "metrics": False,
+}
+
+# Pipeline configurations compared by the suite. "parallel" uses one worker per clip.
+SUITE_CONFIGURATIONS = {
+    "fused": {"fused_pipeline": True},
+    "two-pass": {"fused_pipeline": False, "stream_stages": False},
+    "streamed": {"fused_pipeline": False, "stream_stages": True},
+    "parallel": {"fused_pipeline": True},
+    "combine-copy": {"combine_videos": True, "stream_copy_combine": True, "virtual_combine": False},
+    "combine-virtual": {"combine_videos": True, "stream_copy_combine": True, "virtual_combine": True},
+    "combine-reencode": {"combine_videos": True, "stream_copy_combine": False},
+}
+
+SUITE_RESOLUTIONS = ["1280x720", "1920x1080"]
+SUITE_DURATIONS = [10, 30]
+SUITE_CLIP_FPS = 60
+
+# How often the temp folder is measured during a run, in seconds
+TEMP_SAMPLE_INTERVAL = 0.2
+
+# Source sizes timed by remap: the 4:3 frames Superview stretches, from 720p to 4K
+REMAP_RESOLUTIONS = ["988x720", "1440x1080", "2880x2160"]
+
+
+def benchmark_tiers(clip, tiers, settings=None, log=None):
+    """Process clip once per tier, returning a list of result dicts"""
+    results = []
+    for tier in tiers:
+        work_dir = Path(tempfile.mkdtemp(prefix=f"cropperview-{tier}-"))
+        try:
+            tier_settings = dict(settings or {})
+            tier_settings.update({
+                "output_folder": str(work_dir),
+                "encoder_tier": tier,
+                "combine_videos": False,
+                "result_cache": False,
+                "max_workers": 1,
+            })
+            pipeline = CropperviewPipeline(tier_settings, log=log)
+
+            start = time.perf_counter()
+            pipeline.run([clip])
+            elapsed = time.perf_counter() - start
+
+            output_file = work_dir / pipeline.generate_output_name(clip)
+            frames, _ = pipeline.media_stats(output_file)
+            results.append({
+                "tier": tier,
+                "seconds": round(elapsed, 3),
+                "frames": frames,
+                "fps": round(frames / elapsed, 2) if frames and elapsed > 0 else None,
+                "output_bytes": os.path.getsize(output_file),
+            })
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def generate_clip(ffmpeg, path, width, height, seconds, fps=SUITE_CLIP_FPS):
+    """Write a synthetic test clip with a tone, unless it already exists"""
+    if path.exists():
+        return path
+    tmp_path = path.with_name(f"{path.stem}.tmp{path.suffix}")
+    cmd = [
+        ffmpeg, "-hide_banner", "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=1000:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", str(fps), "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest",
+        str(tmp_path)
+    ]
+    subprocess.run(cmd, stdin=subprocess.DEVNULL, check=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def peak_rss():
+    """Largest resident set of this process or any finished child (ffmpeg, HandBrake), in bytes"""
+    if resource is None:
+        return None
+    largest = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return largest if sys.platform == "darwin" else largest * 1024
+
+
+class TempFolderSampler:
+    """Measures the files written to a temp folder while the pipeline runs.
+
+    written is the sum of the largest size seen of every file, peak the
+    largest total size of the folder at any sample.
+    """
+
+    def __init__(self, folder, interval=TEMP_SAMPLE_INTERVAL):
+        self.folder = Path(folder)
+        self.interval = interval
+        self.sizes = {}
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def written(self):
+        return sum(self.sizes.values())
+
+    def sample(self):
+        total = 0
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue  # Removed between listing and stat
+                total += size
+                self.sizes[path] = max(size, self.sizes.get(path, 0))
+        self.peak = max(self.peak, total)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+def measure_run(files, settings):
+    """Run the pipeline once and measure it. Meant to run in a fresh process so peak RSS is its own."""
+    output_path = Path(settings["output_folder"])
+    sampler = TempFolderSampler(output_path / "temp")
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        CropperviewPipeline(settings).run(files)
+    finally:
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+
+    output_bytes = sum(path.stat().st_size for path in output_path.iterdir() if path.is_file())
+    return {
+        "seconds": round(elapsed, 3),
+        "peak_rss_bytes": peak_rss(),
+        "temp_bytes_written": sampler.written,
+        "temp_peak_bytes": sampler.peak,
+        "output_bytes": output_bytes,
+    }
+
+
+def run_isolated(files, settings):
+    """measure_run in a child process; returns its result or an error"""
+    cmd = [sys.executable, os.path.abspath(__file__), "run", "--settings", json.dumps(settings), *map(str, files)]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                            universal_newlines=True)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {result.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark_suite(clip_dir, resolutions, durations, clips_per_set, configurations, log=print):
+    """Run every configuration on a set of synthetic clips per resolution and duration"""
+    probe = CropperviewPipeline()
+    ffmpeg = probe.find_tool("ffmpeg")
+    if not ffmpeg:
+        raise FileNotFoundError("ffmpeg is needed to generate the test clips")
+    clip_dir = Path(clip_dir)
+    clip_dir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    for resolution in resolutions:
+        width, height = (int(value) for value in resolution.split("x"))
+        for seconds in durations:
+            clip_name = f"{resolution}-{seconds}s"
+            log(f"Generating {clips_per_set} clip(s): {clip_name}")
+            clips = [generate_clip(ffmpeg, clip_dir / f"testsrc2-{clip_name}-{i + 1}.mp4", width, height, seconds)
+                     for i in range(clips_per_set)]
+            frames = sum(probe.media_stats(clip)[0] for clip in clips)
+
+            for name in configurations:
+                work_dir = Path(tempfile.mkdtemp(prefix=f"cropperview-{name}-"))
+                try:
+                    settings = dict(DEFAULT_SETTINGS)
+                    settings.update(SUITE_BASE_SETTINGS)
+                    settings.update(SUITE_CONFIGURATIONS[name])
+                    settings["output_folder"] = str(work_dir)
+                    if name == "parallel":
+                        settings["max_workers"] = len(clips)
+
+                    log(f"Running {name} on {clip_name}")
+                    result = {"clip": clip_name, "clips": len(clips), "configuration": name, "frames": frames}
+                    result.update(run_isolated(clips, settings))
+                    if "seconds" in result:
+                        result["fps"] = round(frames / result["seconds"], 2) if result["seconds"] > 0 else None
+                    results.append(result)
+                finally:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def reference_remap(source, columns, index, interpolation):
+    """Straightforward NumPy remap of a plane, as the kernel is checked against"""
+    if interpolation == "nearest":
+        return source.reshape(-1)[index]
+    columns = np.clip(columns, 0, source.shape[1] - 1)
+    left = np.floor(columns).astype(np.intp)
+    right = np.minimum(left + 1, source.shape[1] - 1)
+    fraction = columns - left
+    rows = source.astype(np.float64)
+    return np.rint(rows[:, left] * (1 - fraction) + rows[:, right] * fraction).astype(np.uint8)
+
+
+def time_remap(remap, frames, pixels):
+    """Megapixels per second of frames calls to remap, after one warm-up call"""
+    remap()
+    start = time.perf_counter()
+    for _ in range(frames):
+        remap()
+    return round(pixels * frames / (time.perf_counter() - start) / 1e6, 1)
+
+
+def benchmark_remap(resolutions, frames, threads):
+    """Kernel against reference throughput on the Y plane, per resolution and interpolation"""
+    if np is None:
+        raise ImportError("numpy is required for the remap benchmark")
+    results = []
+    for resolution in resolutions:
+        width, height = (int(value) for value in resolution.split("x"))
+        out_width, out_height, xmap, ymap = generate_maps(width, height)
+        index = np.asarray(ymap, dtype=np.intp) * width + np.asarray(xmap, dtype=np.intp)
+        columns = np.asarray(source_columns(width, height))
+        source = np.random.default_rng(0).integers(0, 256, (height, width), dtype=np.uint8)
+        out = np.empty((out_height, out_width), dtype=np.uint8)
+        pixels = out_width * out_height
+
+        for interpolation in INTERPOLATIONS:
+            if interpolation == "nearest":
+                kernel = RemapKernel(index, out_width, out_height)
+            else:
+                linear, weights = linear_index(columns, np.arange(out_height), width, 0, width - 1)
+                kernel = RemapKernel(linear, out_width, out_height, weights)
+            reference = reference_remap(source, columns, index, interpolation)
+            baseline = time_remap(lambda: reference_remap(source, columns, index, interpolation), frames, pixels)
+            results.append({"resolution": resolution, "interpolation": interpolation, "implementation": "reference",
+                            "threads": 1, "mp_per_second": baseline, "speedup": 1.0, "max_error": 0})
+            for count in sorted({1, threads}):
+                with ThreadPoolExecutor(max_workers=count) as executor:
+                    pool = executor if count > 1 else None
+                    speed = time_remap(lambda: kernel.apply(source, out, pool, count), frames, pixels)
+                error = int(np.abs(out.astype(np.int16) - reference.reshape(out.shape)).max())
+                results.append({"resolution": resolution, "interpolation": interpolation, "implementation": "kernel",
+                                "threads": count, "mp_per_second": speed,
+                                "speedup": round(speed / baseline, 2) if baseline else None, "max_error": error})
+    return results
+
+
+def find_regressions(results, baseline, max_regression):
+    """Results whose wall time grew by more than max_regression (a fraction) over the baseline report"""
+    previous = {(row["clip"], row["configuration"]): row for row in baseline.get("results", []) if "seconds" in row}
+    regressions = []
+    for row in results:
+        before = previous.get((row["clip"], row["configuration"]))
+        if before and "seconds" in row and row["seconds"] > before["seconds"] * (1 + max_regression):
+            regressions.append((row, before))
+    return regressions
+
+
+def print_table(results, columns):
+    widths = [max(len(column), *(len(str(row.get(column))) for row in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in results:
+        print("  ".join(str(row.get(column)).ljust(width) for column, width in zip(columns, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cropperview benchmarks")
+    commands = parser.add_subparsers(dest="command")
+
+    tiers_parser = commands.add_parser("tiers", help="Encoding speed and output size per encoder tier")
+    tiers_parser.add_argument("clip", help="Reference clip")
+    tiers_parser.add_argument("--tiers", nargs="+", choices=list(ENCODER_TIERS), default=list(ENCODER_TIERS))
+    tiers_parser.add_argument("--crop", default="0:0:144:148", help="Crop values as top:bottom:left:right")
+    tiers_parser.add_argument("--json", help="Also write the results to this JSON file")
+
+    suite_parser = commands.add_parser("suite", help="Every pipeline configuration on synthetic clips")
+    suite_parser.add_argument("--resolutions", nargs="+", default=SUITE_RESOLUTIONS, metavar="WxH")
+    suite_parser.add_argument("--durations", nargs="+", type=int, default=SUITE_DURATIONS, metavar="SECONDS")
+    suite_parser.add_argument("--clips", type=int, default=3, help="Clips per resolution and duration")
+    suite_parser.add_argument("--configurations", nargs="+", choices=list(SUITE_CONFIGURATIONS),
+                              default=list(SUITE_CONFIGURATIONS))
+    suite_parser.add_argument("--clip-dir", default=os.path.join("cache", "benchmark_clips"),
+                              help="Where generated clips are kept between runs")
+    suite_parser.add_argument("--json", help="Also write the report to this JSON file")
+    suite_parser.add_argument("--baseline", help="Earlier JSON report to compare wall times against")
+    suite_parser.add_argument("--max-regression", type=float, default=0.1,
+                              help="Allowed slowdown against the baseline, as a fraction (default 0.1)")
+
+    remap_parser = commands.add_parser("remap", help="Remap kernel throughput against a NumPy reference")
+    remap_parser.add_argument("--resolutions", nargs="+", default=REMAP_RESOLUTIONS, metavar="WxH",
+                              help="Source sizes, before the Superview stretch")
+    remap_parser.add_argument("--frames", type=int, default=20, help="Frames timed per measurement")
+    remap_parser.add_argument("--threads", type=int, default=os.cpu_count() or 1,
+                              help="Thread pool size for the multi-threaded run (default: CPU count)")
+    remap_parser.add_argument("--json", help="Also write the results to this JSON file")
+
+    run_parser = commands.add_parser("run", help="Measure one pipeline run (used by suite)")
+    run_parser.add_argument("--settings", required=True, help="Pipeline settings as JSON")
+    run_parser.add_argument("files", nargs="+")
+
+    args = parser.parse_args(argv)
+    if args.command == "suite":
+        return run_suite(args)
+    if args.command == "remap":
+        results = benchmark_remap(args.resolutions, args.frames, args.threads)
+        print_table(results, ["resolution", "interpolation", "implementation", "threads", "mp_per_second",
+                              "speedup", "max_error"])
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+        return 0
+    if args.command == "run":
+        print(json.dumps(measure_run(args.files, json.loads(args.settings))))
+        return 0
+    if args.command != "tiers":
+        parser.print_help()
+        return 1
+
+    results = benchmark_tiers(args.clip, args.tiers, {"crop_values": args.crop})
+    print_table(results, ["tier", "seconds", "frames", "fps", "output_bytes"])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+def run_suite(args):
+    results = benchmark_suite(args.clip_dir, args.resolutions, args.durations, args.clips, args.configurations)
+    print_table(results, ["clip", "configuration", "seconds", "fps", "peak_rss_bytes", "temp_bytes_written",
+                          "output_bytes", "error"])
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.max_regression)
+        for row, before in regressions:
+            print(f"Regression: {row['configuration']} on {row['clip']} took {row['seconds']}s "
+                  f"(baseline {before['seconds']}s)")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,543 @@
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox, scrolledtext
+import os
+import threading
+from pathlib import Path
+
+from log_queue import LogQueue
+from progress import describe
+from pipeline import (CropperviewPipeline, DEFAULT_SETTINGS, ENCODER_TIERS, find_video_files,
+                      load_settings, open_scan_index, save_settings)
+from superview import SuperviewEngine
+
+# How often queued log lines are shown, and how many lines the log window keeps
+LOG_POLL_MS = 100
+LOG_MAX_LINES = 2000
+
+class CropperviewGUI:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Cropperview")
+        self.root.geometry("800x700")
+        self.root.resizable(True, True)
+        
+        # Get the directory where this script is located
+        self.script_dir = Path(__file__).parent.absolute()
+        
+        # Variables
+        self.input_files = []
+        self.input_folder = tk.StringVar()
+        self.output_folder = tk.StringVar()
+        self.use_same_output = tk.BooleanVar(value=False)
+        self.combine_videos = tk.BooleanVar(value=True)
+        self.enable_crop = tk.BooleanVar(value=True)
+        self.enable_superview = tk.BooleanVar(value=True)
+        self.crop_values = tk.StringVar(value="0:0:144:148")
+        self.fused_pipeline = tk.BooleanVar(value=True)
+        self.stream_copy_combine = tk.BooleanVar(value=True)
+        self.virtual_combine = tk.BooleanVar(value=True)
+        self.stream_stages = tk.BooleanVar(value=True)
+        self.result_cache = tk.BooleanVar(value=True)
+        self.encoder_tier = tk.StringVar(value=DEFAULT_SETTINGS["encoder_tier"])
+        self.split_encode = tk.BooleanVar(value=False)
+        self.segment_seconds = tk.IntVar(value=DEFAULT_SETTINGS["segment_seconds"])
+        self.use_scan_index = DEFAULT_SETTINGS["scan_index"]
+        self.scan_index = None
+        self.result_cache_max_gb = DEFAULT_SETTINGS["result_cache_max_gb"]
+        # Only set in settings.json; kept so saving from the GUI does not drop them
+        self.temp_folder = DEFAULT_SETTINGS["temp_folder"]
+        self.stage_temp_folders = DEFAULT_SETTINGS["stage_temp_folders"]
+        self.superview_interpolation = DEFAULT_SETTINGS["superview_interpolation"]
+        self.resume = DEFAULT_SETTINGS["resume"]
+        self.watch_poll_seconds = DEFAULT_SETTINGS["watch_poll_seconds"]
+        self.watch_settle_seconds = DEFAULT_SETTINGS["watch_settle_seconds"]
+        self.skip_invalid_inputs = DEFAULT_SETTINGS["skip_invalid_inputs"]
+        self.probe_cache = DEFAULT_SETTINGS["probe_cache"]
+        self.metrics = DEFAULT_SETTINGS["metrics"]
+        self.superview_engine = tk.StringVar(value="ffmpeg")
+        self.max_workers = tk.IntVar(value=DEFAULT_SETTINGS["max_workers"])
+        
+        # Processing threads never touch widgets: log lines, progress and dialogs are handed to the UI thread
+        self.log_queue = LogQueue(self.script_dir / "logs" / "cropperview.log")
+        self.pending_progress = None
+        self.pending_status = None
+        self.pending_calls = []
+        self.pending_calls_lock = threading.Lock()
+        self.progress_marks = {}
+        
+        # Default paths
+        self.input_folder.set("input_videos")
+        self.output_folder.set("output_videos")
+        
+        self.setup_ui()
+        self.root.after(LOG_POLL_MS, self.drain_log)
+        self.load_settings()
+        
+        # Auto-scan on startup if input folder exists
+        self.auto_scan_on_startup()
+        
+    def auto_scan_on_startup(self):
+        """Automatically scan for files on startup if input folder exists"""
+        input_path = Path(self.input_folder.get())
+        if input_path.exists():
+            self.log_message("Auto-scanning for video files on startup...")
+            self.scan_video_files()
+    
+    def setup_ui(self):
+        # Main frame with padding
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Configure grid weights
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        main_frame.columnconfigure(1, weight=1)
+        
+        # Title
+        title_label = ttk.Label(main_frame, text="Cropperview", font=("Arial", 16, "bold"))
+        title_label.grid(row=0, column=0, columnspan=3, pady=(0, 20))
+        
+        # Input Section
+        input_frame = ttk.LabelFrame(main_frame, text="Input Files", padding="10")
+        input_frame.grid(row=1, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
+        input_frame.columnconfigure(1, weight=1)
+        
+        ttk.Label(input_frame, text="Input Folder:").grid(row=0, column=0, sticky=tk.W, padx=(0, 5))
+        input_entry = ttk.Entry(input_frame, textvariable=self.input_folder, width=50)
+        input_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(0, 5))
+        ttk.Button(input_frame, text="Browse", command=self.smart_browse).grid(row=0, column=2)
+        
+        # File list
+        file_frame = ttk.LabelFrame(main_frame, text="Detected Video Files", padding="10")
+        file_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+        file_frame.columnconfigure(0, weight=1)
+        file_frame.rowconfigure(0, weight=1)
+        
+        self.file_listbox = tk.Listbox(file_frame, height=6)
+        self.file_listbox.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Scrollbar for file list
+        file_scrollbar = ttk.Scrollbar(file_frame, orient=tk.VERTICAL, command=self.file_listbox.yview)
+        file_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.file_listbox.configure(yscrollcommand=file_scrollbar.set)
+        
+        # Output Section
+        output_frame = ttk.LabelFrame(main_frame, text="Output Settings", padding="10")
+        output_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
+        output_frame.columnconfigure(1, weight=1)
+        
+        # Same output folder checkbox
+        same_output_check = ttk.Checkbutton(output_frame, text="Use same folder as input", 
+                                          variable=self.use_same_output, command=self.toggle_output_folder)
+        same_output_check.grid(row=0, column=0, columnspan=3, sticky=tk.W, pady=(0, 5))
+        
+        ttk.Label(output_frame, text="Output Folder:").grid(row=1, column=0, sticky=tk.W, padx=(0, 5))
+        self.output_entry = ttk.Entry(output_frame, textvariable=self.output_folder, width=50)
+        self.output_entry.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(0, 5))
+        self.output_browse_btn = ttk.Button(output_frame, text="Browse", command=self.browse_output_folder)
+        self.output_browse_btn.grid(row=1, column=2)
+        
+        # Processing Options
+        options_frame = ttk.LabelFrame(main_frame, text="Processing Options", padding="10")
+        options_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
+        
+        # Combine videos option
+        combine_check = ttk.Checkbutton(options_frame, text="Combine multiple videos (if detected)", 
+                                      variable=self.combine_videos)
+        combine_check.grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=(0, 5))
+        
+        stream_copy_check = ttk.Checkbutton(options_frame, text="Join without re-encoding when files are compatible",
+                                            variable=self.stream_copy_combine)
+        stream_copy_check.grid(row=0, column=2, sticky=tk.W, padx=(20, 0), pady=(0, 5))
+        
+        virtual_check = ttk.Checkbutton(options_frame, text="Stream joined files into the encoder (no combined file)",
+                                        variable=self.virtual_combine)
+        virtual_check.grid(row=1, column=2, sticky=tk.W, padx=(20, 0), pady=(0, 5))
+        
+        # Crop option with inline text box
+        crop_frame = ttk.Frame(options_frame)
+        crop_frame.grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=(0, 5))
+        
+        crop_check = ttk.Checkbutton(crop_frame, text="Crop videos", variable=self.enable_crop)
+        crop_check.pack(side=tk.LEFT)
+        
+        ttk.Label(crop_frame, text="Crop (top:bottom:left:right or auto):").pack(side=tk.LEFT, padx=(20, 5))
+        crop_entry = ttk.Combobox(crop_frame, textvariable=self.crop_values, width=15,
+                                  values=("auto", DEFAULT_SETTINGS["crop_values"]))
+        crop_entry.pack(side=tk.LEFT)
+        
+        # Superview option with engine selection
+        superview_frame = ttk.Frame(options_frame)
+        superview_frame.grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=(0, 5))
+        
+        superview_check = ttk.Checkbutton(superview_frame, text="Apply Superview", variable=self.enable_superview)
+        superview_check.pack(side=tk.LEFT)
+        
+        ttk.Label(superview_frame, text="Engine:").pack(side=tk.LEFT, padx=(20, 5))
+        engine_combo = ttk.Combobox(superview_frame, textvariable=self.superview_engine, width=13, state="readonly",
+                                    values=SuperviewEngine.BACKENDS + ("superview-cli",))
+        engine_combo.pack(side=tk.LEFT)
+        
+        # Fused crop + superview option
+        fused_check = ttk.Checkbutton(options_frame, text="Crop and Superview in a single pass (requires ffmpeg)",
+                                    variable=self.fused_pipeline)
+        fused_check.grid(row=3, column=0, columnspan=2, sticky=tk.W, pady=(0, 5))
+        
+        stream_check = ttk.Checkbutton(options_frame, text="Otherwise pipe crop into Superview (no temp files)",
+                                       variable=self.stream_stages)
+        stream_check.grid(row=3, column=2, sticky=tk.W, padx=(20, 0), pady=(0, 5))
+        
+        # Parallel processing option
+        workers_frame = ttk.Frame(options_frame)
+        workers_frame.grid(row=4, column=0, columnspan=2, sticky=tk.W, pady=(0, 5))
+        
+        ttk.Label(workers_frame, text="Files processed in parallel:").pack(side=tk.LEFT)
+        workers_spin = ttk.Spinbox(workers_frame, from_=1, to=max(1, os.cpu_count() or 1),
+                                   textvariable=self.max_workers, width=5)
+        workers_spin.pack(side=tk.LEFT, padx=(5, 0))
+        
+        ttk.Label(workers_frame, text="Quality:").pack(side=tk.LEFT, padx=(20, 5))
+        tier_combo = ttk.Combobox(workers_frame, textvariable=self.encoder_tier, width=13, state="readonly",
+                                  values=list(ENCODER_TIERS))
+        tier_combo.pack(side=tk.LEFT)
+        
+        # Split encode option
+        split_frame = ttk.Frame(options_frame)
+        split_frame.grid(row=6, column=0, columnspan=2, sticky=tk.W, pady=(0, 5))
+        
+        split_check = ttk.Checkbutton(split_frame, text="Encode a single long video in parallel segments of",
+                                      variable=self.split_encode)
+        split_check.pack(side=tk.LEFT)
+        segment_spin = ttk.Spinbox(split_frame, from_=10, to=3600, increment=10,
+                                   textvariable=self.segment_seconds, width=6)
+        segment_spin.pack(side=tk.LEFT, padx=(5, 5))
+        ttk.Label(split_frame, text="seconds").pack(side=tk.LEFT)
+        
+        # Result cache option
+        cache_check = ttk.Checkbutton(options_frame, text="Skip files already processed with the same settings",
+                                      variable=self.result_cache)
+        cache_check.grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=(0, 5))
+        
+        # Process button
+        process_btn = ttk.Button(main_frame, text="Start Processing", command=self.start_processing)
+        process_btn.grid(row=5, column=0, columnspan=3, pady=(10, 0))
+        
+        # Progress and log
+        log_frame = ttk.LabelFrame(main_frame, text="Processing Log", padding="10")
+        log_frame.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(10, 0))
+        log_frame.columnconfigure(0, weight=1)
+        log_frame.rowconfigure(0, weight=1)
+        
+        self.log_text = scrolledtext.ScrolledText(log_frame, height=10, width=80)
+        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Progress bar
+        self.progress_var = tk.DoubleVar()
+        self.progress_bar = ttk.Progressbar(main_frame, variable=self.progress_var, maximum=100)
+        self.progress_bar.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
+        
+        # Batch and per-file throughput and ETA
+        self.status_var = tk.StringVar()
+        status_label = ttk.Label(main_frame, textvariable=self.status_var)
+        status_label.grid(row=8, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        
+        # Configure main frame grid weights
+        main_frame.rowconfigure(2, weight=1)
+        main_frame.rowconfigure(6, weight=1)
+        
+    def toggle_output_folder(self):
+        if self.use_same_output.get():
+            self.output_entry.config(state='disabled')
+            self.output_browse_btn.config(state='disabled')
+            self.output_folder.set(self.input_folder.get())
+        else:
+            self.output_entry.config(state='normal')
+            self.output_browse_btn.config(state='normal')
+    
+    def smart_browse(self):
+        """Smart browse that allows selecting both folders and individual files"""
+        # Create a custom dialog to choose between folder and file selection
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Select Input")
+        dialog.geometry("300x150")
+        dialog.resizable(False, False)
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        # Center the dialog
+        dialog.geometry("+%d+%d" % (self.root.winfo_rootx() + 50, self.root.winfo_rooty() + 50))
+        
+        # Add buttons
+        ttk.Label(dialog, text="Choose input method:", font=("Arial", 12)).pack(pady=20)
+        
+        ttk.Button(dialog, text="Select Folder", 
+                  command=lambda: [self.browse_input_folder(), dialog.destroy()]).pack(pady=5)
+        
+        ttk.Button(dialog, text="Select Individual Files", 
+                  command=lambda: [self.browse_input_files(), dialog.destroy()]).pack(pady=5)
+        
+        ttk.Button(dialog, text="Cancel", 
+                  command=dialog.destroy).pack(pady=5)
+        
+        # Wait for dialog to close
+        dialog.wait_window()
+    
+    def browse_input_folder(self):
+        folder = filedialog.askdirectory(title="Select Input Folder")
+        if folder:
+            self.input_folder.set(folder)
+            if self.use_same_output.get():
+                self.output_folder.set(folder)
+            # Automatically scan for video files when folder is selected
+            self.scan_video_files()
+    
+    def browse_input_files(self):
+        """Browse for individual video files"""
+        video_extensions = [
+            ("Video files", "*.mp4 *.avi *.mov *.mkv *.wmv *.flv *.webm *.m4v *.ts"),
+            ("MP4 files", "*.mp4"),
+            ("AVI files", "*.avi"),
+            ("MOV files", "*.mov"),
+            ("MKV files", "*.mkv"),
+            ("TS files", "*.ts"),
+            ("All files", "*.*")
+        ]
+        
+        files = filedialog.askopenfilenames(
+            title="Select Video Files",
+            filetypes=video_extensions
+        )
+        
+        if files:
+            self.input_files = list(files)
+            # Update file listbox
+            self.file_listbox.delete(0, tk.END)
+            for file_path in self.input_files:
+                self.file_listbox.insert(tk.END, os.path.basename(file_path))
+            
+            # Set input folder to the directory of the first file
+            if self.input_files:
+                first_file_dir = str(Path(self.input_files[0]).parent)
+                self.input_folder.set(first_file_dir)
+                if self.use_same_output.get():
+                    self.output_folder.set(first_file_dir)
+            
+            self.log_message(f"Selected {len(self.input_files)} video file(s)")
+            
+            # Show combine option if multiple files
+            if len(self.input_files) > 1:
+                self.log_message("Multiple files detected. You can choose to combine them or process separately.")
+    
+    def browse_output_folder(self):
+        folder = filedialog.askdirectory(title="Select Output Folder")
+        if folder:
+            self.output_folder.set(folder)
+    
+    def scan_video_files(self):
+        self.log_message("Scanning for video files...")
+        input_path = Path(self.input_folder.get())
+        
+        if not input_path.exists():
+            messagebox.showerror("Error", f"Input folder does not exist: {input_path}")
+            return
+        
+        # The persistent index makes re-scanning an unchanged folder near-instant
+        if self.use_scan_index:
+            if self.scan_index is None:
+                self.scan_index = open_scan_index(self.script_dir)
+            self.input_files = find_video_files(input_path, self.scan_index)
+        else:
+            self.input_files = find_video_files(input_path)
+        
+        # Update file listbox
+        self.file_listbox.delete(0, tk.END)
+        for file_path in self.input_files:
+            self.file_listbox.insert(tk.END, os.path.basename(file_path))
+        
+        self.log_message(f"Found {len(self.input_files)} video file(s)")
+        
+        # Show combine option if multiple files
+        if len(self.input_files) > 1:
+            self.log_message("Multiple files detected. You can choose to combine them or process separately.")
+    
+    def log_message(self, message):
+        """Log a message; safe to call from any thread"""
+        self.log_queue.put(message)
+    
+    def set_progress(self, percent):
+        """Update the progress bar; safe to call from any thread"""
+        self.pending_progress = percent
+    
+    def set_status(self, snapshot):
+        """Update the throughput/ETA line; safe to call from any thread"""
+        self.pending_status = snapshot
+    
+    def call_in_ui(self, function, *args):
+        """Run function on the Tk thread at the next log drain"""
+        with self.pending_calls_lock:
+            self.pending_calls.append((function, args))
+    
+    def drain_log(self):
+        """Show queued log lines and progress, then reschedule"""
+        try:
+            lines = self.log_queue.drain()
+            for line, key in lines:
+                self.show_log_line(line, key)
+            if lines:
+                self.trim_log()
+                self.log_text.see(tk.END)
+            
+            if self.pending_progress is not None:
+                self.progress_var.set(self.pending_progress)
+                self.pending_progress = None
+            if self.pending_status is not None:
+                self.status_var.set(describe(self.pending_status))
+                self.pending_status = None
+            
+            with self.pending_calls_lock:
+                calls, self.pending_calls = self.pending_calls, []
+            for function, args in calls:
+                function(*args)
+        finally:
+            self.root.after(LOG_POLL_MS, self.drain_log)
+    
+    def show_log_line(self, line, key):
+        """Append a line, or replace the previous progress line from the same tool"""
+        if key is None:
+            self.progress_marks.clear()
+        elif key in self.progress_marks:
+            mark = self.progress_marks[key]
+            self.log_text.delete(mark, f"{mark} lineend")
+            self.log_text.insert(mark, line)
+            return
+        
+        if key is not None:
+            mark = f"progress{len(self.progress_marks)}"
+            self.log_text.mark_set(mark, "end-1c")
+            self.log_text.mark_gravity(mark, tk.LEFT)
+            self.progress_marks[key] = mark
+        self.log_text.insert(tk.END, f"{line}\n")
+    
+    def trim_log(self):
+        """Keep only the last LOG_MAX_LINES lines; the full log is in logs/cropperview.log"""
+        excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - LOG_MAX_LINES
+        if excess > 0:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
+    
+    def start_processing(self):
+        if not self.input_files:
+            messagebox.showerror("Error", "No video files found. Please select an input folder or files first.")
+            return
+        
+        # Start processing in a separate thread
+        processing_thread = threading.Thread(target=self.process_videos)
+        processing_thread.daemon = True
+        processing_thread.start()
+    
+    def current_settings(self):
+        """Settings from the UI, in the format used by settings.json and the pipeline"""
+        return {
+            "input_folder": self.input_folder.get(),
+            "output_folder": self.output_folder.get(),
+            "crop_values": self.crop_values.get(),
+            "enable_crop": self.enable_crop.get(),
+            "enable_superview": self.enable_superview.get(),
+            "combine_videos": self.combine_videos.get(),
+            "fused_pipeline": self.fused_pipeline.get(),
+            "stream_copy_combine": self.stream_copy_combine.get(),
+            "virtual_combine": self.virtual_combine.get(),
+            "stream_stages": self.stream_stages.get(),
+            "encoder_tier": self.encoder_tier.get(),
+            "split_encode": self.split_encode.get(),
+            "segment_seconds": self.segment_seconds.get(),
+            "scan_index": self.use_scan_index,
+            "result_cache": self.result_cache.get(),
+            "result_cache_max_gb": self.result_cache_max_gb,
+            "temp_folder": self.temp_folder,
+            "stage_temp_folders": self.stage_temp_folders,
+            "superview_interpolation": self.superview_interpolation,
+            "resume": self.resume,
+            "watch_poll_seconds": self.watch_poll_seconds,
+            "watch_settle_seconds": self.watch_settle_seconds,
+            "skip_invalid_inputs": self.skip_invalid_inputs,
+            "probe_cache": self.probe_cache,
+            "metrics": self.metrics,
+            "superview_engine": self.superview_engine.get(),
+            "max_workers": self.max_workers.get()
+        }
+    
+    def process_videos(self):
+        try:
+            pipeline = CropperviewPipeline(self.current_settings(), log=self.log_message,
+                                           progress=self.set_progress, status=self.set_status,
+                                           script_dir=self.script_dir)
+            pipeline.run(self.input_files)
+            
+            # Play completion chime
+            try:
+                import winsound
+                winsound.MessageBeep(winsound.MB_ICONASTERISK)
+            except:
+                # Fallback if winsound fails
+                pass
+            
+            self.call_in_ui(messagebox.showinfo, "Success", "Video processing completed successfully!")
+            
+        except Exception as e:
+            self.log_message(f"Error during processing: {str(e)}")
+            self.call_in_ui(messagebox.showerror, "Error", f"Processing failed: {str(e)}")
+    
+    def load_settings(self):
+        try:
+            settings = load_settings()
+            
+            self.input_folder.set(settings["input_folder"])
+            self.output_folder.set(settings["output_folder"])
+            self.crop_values.set(settings["crop_values"])
+            self.enable_crop.set(settings["enable_crop"])
+            self.enable_superview.set(settings["enable_superview"])
+            self.combine_videos.set(settings["combine_videos"])
+            self.fused_pipeline.set(settings["fused_pipeline"])
+            self.stream_copy_combine.set(settings["stream_copy_combine"])
+            self.virtual_combine.set(settings["virtual_combine"])
+            self.stream_stages.set(settings["stream_stages"])
+            self.encoder_tier.set(settings["encoder_tier"])
+            self.split_encode.set(settings["split_encode"])
+            self.segment_seconds.set(settings["segment_seconds"])
+            self.use_scan_index = settings["scan_index"]
+            self.result_cache.set(settings["result_cache"])
+            self.result_cache_max_gb = settings["result_cache_max_gb"]
+            self.temp_folder = settings["temp_folder"]
+            self.stage_temp_folders = settings["stage_temp_folders"]
+            self.superview_interpolation = settings["superview_interpolation"]
+            self.resume = settings["resume"]
+            self.watch_poll_seconds = settings["watch_poll_seconds"]
+            self.watch_settle_seconds = settings["watch_settle_seconds"]
+            self.skip_invalid_inputs = settings["skip_invalid_inputs"]
+            self.probe_cache = settings["probe_cache"]
+            self.metrics = settings["metrics"]
+            self.superview_engine.set(settings["superview_engine"])
+            self.max_workers.set(settings["max_workers"])
+        except Exception as e:
+            self.log_message(f"Could not load settings: {e}")
+    
+    def save_settings(self):
+        try:
+            save_settings(self.current_settings())
+        except Exception as e:
+            self.log_message(f"Could not save settings: {e}")
+
+def run_gui():
+    root = tk.Tk()
+    app = CropperviewGUI(root)
+    
+    # Save settings when closing
+    def on_closing():
+        app.save_settings()
+        root.destroy()
+    
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.mainloop()
+
+if __name__ == "__main__":
+    run_gui()
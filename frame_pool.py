@@ -0,0 +1,204 @@
+"""Preallocated frame buffers for the in-process frame pipeline.
+
+Decoding, transforming and encoding run on separate threads and hand frames
+to each other through two bounded pools: decoded frames and transformed
+frames. Every buffer is allocated once, aligned, and reused for the whole
+video, so steady-state processing allocates nothing per frame and memory use
+is fixed at (input pool + output pool) x frame size. A stage that runs ahead
+blocks until a buffer is released (backpressure), so a slow encoder holds the
+decoder back instead of letting frames pile up.
+
+Buffers hold one raw frame exactly as ffmpeg's rawvideo muxer lays it out,
+so they can be filled and written with a single call; planar formats expose
+each plane (Y, U and V for yuv420p) as a numpy view into the buffer.
+"""
+import queue
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Start of each buffer, in bytes; a cache line and the widest SIMD loads
+ALIGNMENT = 64
+
+# Frames in each pool: enough to keep every stage busy while the others catch up
+POOL_SIZE = 4
+
+# Bytes per pixel and plane subsampling (x shift, y shift) of the supported raw formats
+PIXEL_FORMATS = {
+    "rgb24": [(3, 0, 0)],
+    "gray": [(1, 0, 0)],
+    "yuv420p": [(1, 0, 0), (1, 1, 1), (1, 1, 1)],
+}
+
+
+def read_exact(stream, buffer):
+    """Fill buffer from stream, returning False at end of stream"""
+    view = memoryview(buffer).cast('B')
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            if filled:
+                raise EOFError("Decoder stopped in the middle of a frame")
+            return False
+        filled += count
+    return True
+
+
+def aligned_empty(size, alignment=ALIGNMENT):
+    """Uninitialised uint8 array of size bytes starting on an alignment boundary"""
+    raw = np.empty(size + alignment, dtype=np.uint8)
+    offset = -raw.ctypes.data % alignment
+    return raw[offset:offset + size]
+
+
+class FrameLayout:
+    """Plane shapes and sizes of a raw frame format"""
+
+    def __init__(self, width, height, pix_fmt="rgb24"):
+        if pix_fmt not in PIXEL_FORMATS:
+            raise ValueError(f"Unsupported pixel format: {pix_fmt}")
+        self.width = width
+        self.height = height
+        self.pix_fmt = pix_fmt
+        self.planes = []
+        self.plane_sizes = []
+        for channels, x_shift, y_shift in PIXEL_FORMATS[pix_fmt]:
+            # Chroma planes round up, as ffmpeg does for odd sizes
+            plane_width = -(-width >> x_shift)
+            plane_height = -(-height >> y_shift)
+            shape = (plane_height, plane_width, channels) if channels > 1 else (plane_height, plane_width)
+            self.planes.append(shape)
+            self.plane_sizes.append(plane_width * plane_height * channels)
+        self.frame_size = sum(self.plane_sizes)
+
+
+class Frame:
+    """One pooled buffer with a view of each plane"""
+
+    def __init__(self, pool, layout):
+        self.pool = pool
+        self.buffer = aligned_empty(layout.frame_size)
+        self.data = memoryview(self.buffer)
+        self.planes = []
+        offset = 0
+        for shape, size in zip(layout.planes, layout.plane_sizes):
+            self.planes.append(self.buffer[offset:offset + size].reshape(shape))
+            offset += size
+
+    def release(self):
+        self.pool.release(self)
+
+
+class PoolClosed(Exception):
+    """Raised by FramePool.acquire once the pipeline has stopped"""
+
+
+class FramePool:
+    def __init__(self, layout, count=POOL_SIZE):
+        if np is None:
+            raise ImportError("numpy is required for frame pools")
+        self.layout = layout
+        self.frames = [Frame(self, layout) for _ in range(count)]
+        self._free = list(self.frames)
+        self._condition = threading.Condition()
+        self._closed = False
+
+    @property
+    def nbytes(self):
+        return self.layout.frame_size * len(self.frames)
+
+    def acquire(self):
+        """Take a free buffer, waiting until one is released"""
+        with self._condition:
+            while not self._free and not self._closed:
+                self._condition.wait()
+            if self._closed:
+                raise PoolClosed()
+            return self._free.pop()
+
+    def release(self, frame):
+        with self._condition:
+            self._free.append(frame)
+            self._condition.notify()
+
+    def close(self):
+        """Wake every waiting stage so it can stop"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+_END = object()
+
+
+def run_frames(source, sink, transform, input_pool, output_pool):
+    """Read frames from source, transform(frame, out) each one and write the results to sink.
+
+    Reading and writing run on their own threads and transform on the
+    calling one, each handing buffers on through a queue; the pools bound
+    how far any stage can get ahead. Returns the number of frames. If a
+    stage fails, the others stop and its error is raised.
+    """
+    decoded = queue.Queue()
+    encoded = queue.Queue()
+    errors = []
+    frames = [0]
+
+    def fail(error):
+        if not isinstance(error, PoolClosed):
+            errors.append(error)
+        input_pool.close()
+        output_pool.close()
+
+    def read():
+        try:
+            while True:
+                frame = input_pool.acquire()
+                if not read_exact(source, frame.data):
+                    frame.release()
+                    break
+                decoded.put(frame)
+        except Exception as e:
+            fail(e)
+        finally:
+            decoded.put(_END)
+
+    def write():
+        try:
+            while True:
+                out = encoded.get()
+                if out is _END:
+                    break
+                sink.write(out.data)
+                out.release()
+                frames[0] += 1
+        except Exception as e:
+            fail(e)
+
+    reader = threading.Thread(target=read, daemon=True)
+    writer = threading.Thread(target=write, daemon=True)
+    reader.start()
+    writer.start()
+    try:
+        while True:
+            frame = decoded.get()
+            if frame is _END:
+                break
+            out = output_pool.acquire()
+            transform(frame, out)
+            frame.release()
+            encoded.put(out)
+    except Exception as e:
+        fail(e)
+    finally:
+        encoded.put(_END)
+        reader.join()
+        writer.join()
+
+    if errors:
+        raise errors[0]
+    return frames[0]
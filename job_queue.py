@@ -0,0 +1,88 @@
+"""Persistent queue of files waiting to be processed.
+
+Backed by SQLite so queued work survives a restart of the watch daemon. A
+file is identified by its path, size and mtime: the same file is only queued
+once, and a file that is replaced by a new version is queued again. Jobs that
+were running when the process stopped are put back in the queue on start.
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    error TEXT,
+    added REAL NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (path, size, mtime)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+"""
+
+
+class JobQueue:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+            # Jobs interrupted by a crash or restart run again
+            self._db.execute("UPDATE jobs SET state = ?, updated = ? WHERE state = ?",
+                             (PENDING, time.time(), RUNNING))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def known(self):
+        """Set of (path, size, mtime) of every file ever queued"""
+        with self._lock:
+            return set(self._db.execute("SELECT path, size, mtime FROM jobs"))
+
+    def enqueue(self, path, size, mtime):
+        """Queue a file; returns False if this version of it was queued before"""
+        now = time.time()
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO jobs (path, size, mtime, state, added, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (str(path), size, mtime, PENDING, now, now))
+            return cursor.rowcount == 1
+
+    def claim(self):
+        """Mark the oldest pending job as running and return (id, path), or None"""
+        with self._lock, self._db:
+            row = self._db.execute("SELECT id, path FROM jobs WHERE state = ? ORDER BY id LIMIT 1",
+                                   (PENDING,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE jobs SET state = ?, updated = ? WHERE id = ?", (RUNNING, time.time(), row[0]))
+            return row
+
+    def finish(self, job_id):
+        self._set_state(job_id, DONE)
+
+    def fail(self, job_id, error):
+        self._set_state(job_id, FAILED, str(error))
+
+    def _set_state(self, job_id, state, error=None):
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET state = ?, error = ?, updated = ? WHERE id = ?",
+                             (state, error, time.time(), job_id))
+
+    def counts(self):
+        """Number of jobs in each state"""
+        with self._lock:
+            return dict(self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
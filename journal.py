@@ -0,0 +1,109 @@
+"""Durable journal of batch progress, for resuming after a crash.
+
+A batch is identified by its input files (path, size and mtime) and the
+settings that affect the output. For every file in a batch the journal
+records the stages it has completed (combined, cropped, superviewed, moved)
+and the file each stage produced, so a batch that is started again picks up
+after the last completed stage instead of starting over.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+COMBINED = "combined"
+CROPPED = "cropped"
+SUPERVIEWED = "superviewed"
+MOVED = "moved"
+
+# Unfinished batches that were not resumed within this time are forgotten
+MAX_AGE_SECONDS = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    batch TEXT PRIMARY KEY,
+    temp_path TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    batch TEXT NOT NULL,
+    item TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (batch, item, stage)
+);
+"""
+
+
+def batch_key(input_files, options):
+    """Identify a batch by its inputs and the settings that change its outputs"""
+    files = []
+    for path in input_files:
+        stat = os.stat(path)
+        files.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    encoded = json.dumps({"files": files, "options": options}, sort_keys=True).encode()
+    return hashlib.blake2b(encoded, digest_size=12).hexdigest()
+
+
+class Journal:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def begin(self, batch, temp_path):
+        """Register a batch; returns True if it was started before and not finished"""
+        with self._lock, self._db:
+            resumed = self._db.execute("SELECT 1 FROM batches WHERE batch = ?", (batch,)).fetchone() is not None
+            self._db.execute("INSERT OR REPLACE INTO batches (batch, temp_path, updated) VALUES (?, ?, ?)",
+                             (batch, str(temp_path), time.time()))
+            return resumed
+
+    def finish(self, batch):
+        """Forget a completed batch"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM stages WHERE batch = ?", (batch,))
+            self._db.execute("DELETE FROM batches WHERE batch = ?", (batch,))
+
+    def record(self, batch, item, stage, path):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO stages (batch, item, stage, path) VALUES (?, ?, ?, ?)",
+                             (batch, str(item), stage, str(path)))
+            self._db.execute("UPDATE batches SET updated = ? WHERE batch = ?", (time.time(), batch))
+
+    def completed(self, batch, item, stage):
+        """Path produced by a completed stage, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT path FROM stages WHERE batch = ? AND item = ? AND stage = ?",
+                                   (batch, str(item), stage)).fetchone()
+        return row[0] if row else None
+
+    def outputs(self, batch):
+        """Every file recorded for a batch"""
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT path FROM stages WHERE batch = ?", (batch,))}
+
+    def expire(self, max_age=MAX_AGE_SECONDS):
+        """Forget stale unfinished batches; returns their temp folders"""
+        cutoff = time.time() - max_age
+        with self._lock, self._db:
+            rows = self._db.execute("SELECT batch, temp_path FROM batches WHERE updated < ?", (cutoff,)).fetchall()
+            for batch, _ in rows:
+                self._db.execute("DELETE FROM stages WHERE batch = ?", (batch,))
+                self._db.execute("DELETE FROM batches WHERE batch = ?", (batch,))
+        return [temp_path for _, temp_path in rows]
+
+    def temp_paths(self):
+        """Temp folders of unfinished batches"""
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT temp_path FROM batches")}
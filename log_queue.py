@@ -0,0 +1,78 @@
+"""Thread-safe hand-off of log lines from processing threads to the GUI.
+
+Processing threads only put messages on a queue; the Tk thread drains it on
+a timer. Progress lines (HandBrake's "Encoding: task ..." and ffmpeg's
+"frame= ...") are coalesced per tool, so only the latest from each is shown
+until an ordinary message is logged. Every message is also written to a
+rotating log file.
+"""
+import logging
+import queue
+import re
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+# "<label>: <progress output>" as forwarded from a child process
+PROGRESS_LINE = re.compile(r"^(?P<label>[^:]{1,40}): (?:Encoding: task|frame=)")
+
+
+def progress_key(message):
+    """The source of a progress line, or None for an ordinary message"""
+    match = PROGRESS_LINE.match(message)
+    return match.group("label") if match else None
+
+
+def open_log_file(path):
+    """Logger writing to a rotating file at path"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    logger = logging.getLogger(f"cropperview.{path}")
+    if not logger.handlers:
+        handler = RotatingFileHandler(str(path), maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS,
+                                      encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+class LogQueue:
+    def __init__(self, log_file=None):
+        self._queue = queue.Queue()
+        self._logger = None
+        if log_file:
+            try:
+                self._logger = open_log_file(log_file)
+            except OSError:
+                pass  # Log to the window only
+
+    def put(self, message):
+        """Queue a message from any thread"""
+        if self._logger is not None:
+            self._logger.info(message)
+        timestamp = time.strftime("%H:%M:%S")
+        self._queue.put((f"[{timestamp}] {message}", progress_key(message)))
+
+    def drain(self, limit=1000):
+        """Take up to limit queued (line, progress key) pairs, with progress lines coalesced"""
+        lines = []
+        progress_positions = {}
+        for _ in range(limit):
+            try:
+                line, key = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if key is None:
+                progress_positions.clear()
+                lines.append((line, key))
+            elif key in progress_positions:
+                lines[progress_positions[key]] = (line, key)
+            else:
+                progress_positions[key] = len(lines)
+                lines.append((line, key))
+        return lines
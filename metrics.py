@@ -0,0 +1,189 @@
+"""Per-stage timing and resource metrics.
+
+Every stage of a job (combine, crop, superview, move, ...) is recorded with
+its start and end time, the CPU time of the child processes it ran, the
+bytes it read and wrote (sizes of its input and output files) and the
+average fps the encoder reported. Records are appended to a JSONL file as
+they complete and summarised per stage at the end of a run.
+
+Child CPU time comes from os.wait4, so it is only available where that
+exists (not on Windows).
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+_context = threading.local()
+
+
+def current_stage():
+    """The stage running on this thread, or None"""
+    return getattr(_context, "stage", None)
+
+
+def set_current_stage(stage):
+    _context.stage = stage
+
+
+def exit_code(status):
+    """Return code in the form subprocess uses, from a wait status"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def wait(process):
+    """Wait for a child process, crediting its CPU time to the stage running on this thread"""
+    if not hasattr(os, "wait4") or process.returncode is not None:
+        return process.wait()
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        return process.wait()
+    process.returncode = exit_code(status)
+    stage = current_stage()
+    if stage is not None:
+        stage.add_cpu(usage.ru_utime + usage.ru_stime)
+    return process.returncode
+
+
+def total_size(paths):
+    """Combined size of the files that exist among paths"""
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except (OSError, TypeError):
+            pass
+    return total
+
+
+class Stage:
+    def __init__(self, recorder, job, name, inputs):
+        self.recorder = recorder
+        self.job = job
+        self.name = name
+        self.inputs = list(inputs)
+        self.output = None
+        self.cpu_seconds = None
+        self.fps_samples = []
+        self._lock = threading.Lock()
+        self._previous = None
+        self.bytes_read = 0
+        self.start = None
+        self._start_counter = None
+
+    def add_cpu(self, seconds):
+        with self._lock:
+            self.cpu_seconds = (self.cpu_seconds or 0.0) + seconds
+
+    def add_fps(self, fps):
+        with self._lock:
+            self.fps_samples.append(fps)
+
+    def __enter__(self):
+        self._previous = current_stage()
+        set_current_stage(self)
+        # Measured up front, since a stage may move or delete its input
+        self.bytes_read = total_size(self.inputs)
+        self.start = time.time()
+        self._start_counter = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        set_current_stage(self._previous)
+        seconds = time.perf_counter() - self._start_counter
+        fps = sum(self.fps_samples) / len(self.fps_samples) if self.fps_samples else None
+        outputs = self.output if isinstance(self.output, list) else [self.output]
+        record = {
+            "type": "stage",
+            "job": self.job,
+            "stage": self.name,
+            "start": round(self.start, 3),
+            "end": round(self.start + seconds, 3),
+            "seconds": round(seconds, 3),
+            "cpu_seconds": round(self.cpu_seconds, 3) if self.cpu_seconds is not None else None,
+            "bytes_read": self.bytes_read,
+            "bytes_written": total_size(output for output in outputs if output),
+            "fps": round(fps, 2) if fps is not None else None,
+            "status": "ok" if exc_type is None else "error",
+        }
+        if exc is not None:
+            record["error"] = str(exc)
+        self.recorder.write(record)
+        return False
+
+
+class MetricsRecorder:
+    def __init__(self, path=None, run_id=None):
+        self.path = Path(path) if path else None
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+        self.records = []
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def stage(self, job, name, inputs=()):
+        """Context manager recording one stage; set .output on it to the file (or list of files) it produced"""
+        return Stage(self, job, name, inputs)
+
+    def write(self, record):
+        record = dict(record, run=self.run_id)
+        with self._lock:
+            if record["type"] == "stage":
+                self.records.append(record)
+            if self.path is not None:
+                try:
+                    with open(self.path, "a") as f:
+                        f.write(json.dumps(record) + "\n")
+                except OSError:
+                    self.path = None  # Keep processing without the metrics file
+
+    def summary(self):
+        """Totals per stage name: count, wall and CPU seconds, bytes and mean fps"""
+        with self._lock:
+            records = list(self.records)
+        stages = {}
+        for record in records:
+            totals = stages.setdefault(record["stage"], {
+                "count": 0, "errors": 0, "seconds": 0.0, "cpu_seconds": 0.0,
+                "bytes_read": 0, "bytes_written": 0, "fps": [],
+            })
+            totals["count"] += 1
+            totals["errors"] += record["status"] != "ok"
+            totals["seconds"] += record["seconds"]
+            totals["cpu_seconds"] += record["cpu_seconds"] or 0.0
+            totals["bytes_read"] += record["bytes_read"]
+            totals["bytes_written"] += record["bytes_written"]
+            if record["fps"] is not None:
+                totals["fps"].append(record["fps"])
+        for totals in stages.values():
+            samples = totals.pop("fps")
+            totals["fps"] = round(sum(samples) / len(samples), 2) if samples else None
+            totals["seconds"] = round(totals["seconds"], 3)
+            totals["cpu_seconds"] = round(totals["cpu_seconds"], 3)
+        return stages
+
+    def finish(self):
+        """Write and return the summary"""
+        stages = self.summary()
+        self.write({"type": "summary", "stages": stages})
+        return stages
+
+
+def describe_summary(stages):
+    """Log lines for a summary"""
+    lines = []
+    for name, totals in stages.items():
+        line = f"{name}: {totals['count']} run(s), {totals['seconds']:.1f}s"
+        if totals["cpu_seconds"]:
+            line += f", CPU {totals['cpu_seconds']:.1f}s"
+        line += f", read {totals['bytes_read'] / 1024 ** 2:.1f} MB, wrote {totals['bytes_written'] / 1024 ** 2:.1f} MB"
+        if totals["fps"]:
+            line += f", {totals['fps']:.1f} fps"
+        if totals["errors"]:
+            line += f", {totals['errors']} failed"
+        lines.append(line)
+    return lines
@@ -0,0 +1,1522 @@
+"""Headless Cropperview processing pipeline.
+
+Everything needed to combine, crop and Superview videos, without any GUI
+dependency. The Tk GUI (cropperview_gui.py) and the command line entry point
+(cropperview.py) both drive a CropperviewPipeline; it reports through the
+callbacks log(message), progress(percent) and status(snapshot), where
+snapshot is a progress.ProgressTracker snapshot with per-file fps and ETA.
+"""
+import io
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import autocrop
+import journal
+import metrics
+import preflight
+from progress import ProgressTracker, describe, parse_progress
+from result_cache import ResultCache
+from scan_index import ScanIndex
+from superview import SuperviewEngine, crop_filter_for, input_args
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v', '.ts'}
+
+DEFAULT_SETTINGS = {
+    "input_folder": "input_videos",
+    "output_folder": "output_videos",
+    "crop_values": "0:0:144:148",
+    "enable_crop": True,
+    "enable_superview": True,
+    "combine_videos": True,
+    "fused_pipeline": True,
+    "stream_copy_combine": True,
+    "virtual_combine": True,
+    "stream_stages": True,
+    "encoder_tier": "standard",
+    "split_encode": False,
+    "segment_seconds": 120,
+    "scan_index": True,
+    "result_cache": True,
+    "result_cache_max_gb": 50,
+    "resume": True,
+    "temp_folder": "",
+    "stage_temp_folders": {},
+    "metrics": True,
+    "probe_cache": True,
+    "skip_invalid_inputs": True,
+    "superview_engine": "ffmpeg",
+    "superview_interpolation": "nearest",
+    "watch_poll_seconds": 5,
+    "watch_settle_seconds": 10,
+    "max_workers": max(1, min(4, (os.cpu_count() or 1) // 4)),
+}
+
+
+# Speed/quality tiers. quality is the CRF / constant quality value, threads 0
+# means use the worker's share of the CPU. "standard" is the original
+# x264 --quality 20 encode.
+ENCODER_TIERS = {
+    "proxy": {"encoder": "x264", "preset": "veryfast", "quality": 28, "threads": 0},
+    "review": {"encoder": "x264", "preset": "fast", "quality": 23, "threads": 0},
+    "standard": {"encoder": "x264", "preset": "medium", "quality": 20, "threads": 0},
+    "master": {"encoder": "x264", "preset": "slow", "quality": 17, "threads": 0},
+    "master-x265": {"encoder": "x265", "preset": "medium", "quality": 20, "threads": 0},
+    "archive-av1": {"encoder": "svt-av1", "preset": "6", "quality": 30, "threads": 0},
+}
+
+# How often a progress summary is written to the log, in seconds
+PROGRESS_LOG_INTERVAL = 30
+
+# Final outputs are written as .<name>.partial<suffix> next to their final name and
+# renamed when complete; leftovers older than this are from runs that died
+PARTIAL_MAX_AGE_SECONDS = 24 * 3600
+
+# Stages whose intermediate files can be given their own temp folder in stage_temp_folders
+TEMP_STAGES = ("combine", "crop", "superview", "segments")
+
+# Allowed difference between source and stitched output duration, in seconds
+SEGMENT_DURATION_TOLERANCE = 0.5
+
+# Segments encoded at once when files are otherwise processed one at a time
+MAX_SEGMENT_WORKERS = 4
+
+# Encoder names as ffmpeg and HandBrake know them
+FFMPEG_ENCODERS = {"x264": "libx264", "x265": "libx265", "svt-av1": "libsvtav1"}
+HANDBRAKE_ENCODERS = {"x264": "x264", "x265": "x265", "svt-av1": "svt_av1"}
+
+
+def ffmpeg_encoder_args(tier):
+    """ffmpeg video encoder arguments for a tier"""
+    return ["-c:v", FFMPEG_ENCODERS[tier["encoder"]], "-preset", str(tier["preset"]),
+            "-crf", str(tier["quality"])]
+
+
+def handbrake_encoder_args(tier, threads=0):
+    """HandBrakeCLI video encoder arguments for a tier"""
+    args = ["--encoder", HANDBRAKE_ENCODERS[tier["encoder"]], "--encoder-preset", str(tier["preset"]),
+            "--quality", str(tier["quality"])]
+    if threads:
+        option = "lp" if tier["encoder"] == "svt-av1" else "threads"
+        args += ["--encopts", f"{option}={threads}"]
+    return args
+
+
+class PipeInput:
+    """A video arriving on stdin from the previous stage, as a NUT stream"""
+    
+    def __init__(self, path):
+        self.path = Path(path)
+    
+    def ffmpeg_args(self):
+        return ["-f", "nut", "-i", "pipe:0"]
+    
+    def __str__(self):
+        return str(self.path)
+    
+    def __fspath__(self):
+        return str(self.path)
+
+
+class ConcatInput:
+    """A combined video that is never written to disk.
+
+    The source files are read back to back through ffmpeg's concat demuxer
+    by whichever stage consumes it. path is the name the combined file would
+    have had, so output naming is unchanged.
+    """
+    
+    def __init__(self, files, list_path, path):
+        self.files = list(files)
+        self.list_path = Path(list_path)
+        self.path = Path(path)
+    
+    def ffmpeg_args(self):
+        return ["-f", "concat", "-safe", "0", "-i", str(self.list_path)]
+    
+    def __str__(self):
+        return str(self.path)
+    
+    def __fspath__(self):
+        return str(self.path)
+
+
+def find_video_files(folder, index=None):
+    """Recursively find video files in a folder, sorted by path.
+    
+    With a ScanIndex, only directories that changed since the last scan are listed.
+    """
+    input_path = Path(folder)
+    if not input_path.exists():
+        raise FileNotFoundError(f"Input folder does not exist: {input_path}")
+    
+    if index is not None:
+        files = [path for path, _, _ in index.scan(input_path, VIDEO_EXTENSIONS)]
+        index.save()
+        return files
+    
+    files = []
+    for file_path in input_path.rglob('*'):
+        if file_path.is_file() and file_path.suffix.lower() in VIDEO_EXTENSIONS:
+            files.append(str(file_path))
+    return sorted(files)
+
+
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+
+def shared_cache(cls, path):
+    """One instance of a file-backed cache per path and process, so parallel pipelines update it together"""
+    key = (cls, str(Path(path).absolute()))
+    with _shared_caches_lock:
+        if key not in _shared_caches:
+            _shared_caches[key] = cls(path)
+        return _shared_caches[key]
+
+
+def open_scan_index(script_dir=None):
+    """The persistent scan index kept next to the scripts, shared within the process"""
+    script_dir = Path(script_dir) if script_dir else Path(__file__).parent.absolute()
+    return shared_cache(ScanIndex, script_dir / "cache" / "scan_index.json")
+
+
+def load_settings(path="settings.json"):
+    """Load saved settings on top of the defaults"""
+    settings = dict(DEFAULT_SETTINGS)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            settings.update(json.load(f))
+    return settings
+
+
+def save_settings(settings, path="settings.json"):
+    """Save settings as JSON"""
+    with open(path, "w") as f:
+        json.dump(settings, f, indent=2)
+
+
+class CropperviewPipeline:
+    def __init__(self, settings=None, log=None, progress=None, script_dir=None, status=None):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings or {})
+        self.log = log or (lambda message: None)
+        self.progress = progress or (lambda percent: None)
+        self.status = status or (lambda snapshot: None)
+        
+        # External tools and the bundled remap tables live next to the scripts
+        self.script_dir = Path(script_dir) if script_dir else Path(__file__).parent.absolute()
+        
+        self.input_files = []
+        self.output_names = {}
+        self.encoder_threads = 0
+        self.superview = None
+        self.journal = None
+        self.batch = None
+        self.batch_temp_path = None
+        self.tracker = None
+        self.last_progress_log = 0
+        self.metrics = metrics.MetricsRecorder()
+        # ffprobe results by (path, size, mtime), and the pre-flight summary of each input
+        self.probe_results = {}
+        self.probe_lock = threading.Lock()
+        self.probe_index = None
+        self.media_info = {}
+        # Detected crop of each input when crop_values is "auto", and the per-camera crop cache
+        self.crops = {}
+        self.crop_profiles = None
+        self.crop_lock = threading.Lock()
+        # The job a worker thread is processing, so encoder output is credited to the right file
+        self.job_context = threading.local()
+        # Pipelines running side by side (e.g. watch mode workers) split the CPU between them
+        self.parallel_runs = 1
+        
+        if self.settings["encoder_tier"] not in ENCODER_TIERS:
+            raise ValueError(f"Unknown encoder tier: {self.settings['encoder_tier']}")
+        self.tier = ENCODER_TIERS[self.settings["encoder_tier"]]
+    
+    def run(self, input_files, temp_path=None):
+        """Run the combine / crop / Superview pipeline over input_files.
+
+        Intermediate files go to a folder per batch in temp_path (default: the
+        temp_folder setting, or output_folder/temp), which is removed
+        afterwards; stage_temp_folders can move a stage's intermediates
+        elsewhere, e.g. to a fast local disk. Final outputs are written in
+        the output folder under a temporary name and renamed into place, so
+        they are never copied. Raises on the first
+        failure; output files already finished are kept, and with the resume
+        setting a failed or interrupted batch continues from its last
+        completed stage when it is run again.
+        """
+        self.input_files = list(input_files)
+        if not self.input_files:
+            raise ValueError("No video files to process")
+        
+        self.progress(0)
+        self.log("Starting video processing...")
+        self.input_files = self.preflight(self.input_files)
+        self.output_names = self.unique_output_names(self.input_files)
+        
+        # Create output directory
+        output_path = Path(self.settings["output_folder"])
+        output_path.mkdir(parents=True, exist_ok=True)
+        
+        # Remap tables are built once per resolution and reused for every file
+        self.encoder_threads = self.tier["threads"]
+        self.superview = self.create_superview_engine()
+        
+        # Create temp directory; each batch gets its own folder so it can be resumed
+        temp_root = Path(temp_path or self.settings["temp_folder"] or output_path / "temp")
+        self.batch = journal.batch_key(self.input_files, dict(self.result_options(self.input_files),
+                                                               output=str(output_path.absolute())))
+        temp_path = temp_root / f"batch-{self.batch}"
+        self.batch_temp_path = temp_path
+        try:
+            self.open_journal(temp_root, temp_path)
+            temp_path.mkdir(parents=True, exist_ok=True)
+            self.remove_stale_partials(output_path)
+            self.metrics = self.open_metrics()
+            
+            self.log(f"Encoder tier: {self.settings['encoder_tier']} ({self.tier['encoder']}, "
+                     f"preset {self.tier['preset']}, quality {self.tier['quality']})")
+            
+            # Skip the whole batch if the combined result is already cached
+            combining = self.settings["combine_videos"] and len(self.input_files) > 1
+            if combining and self.fetch_cached_result(self.input_files, temp_path / "combined.mp4", output_path):
+                self.finish_batch(temp_root, temp_path)
+                self.progress(100)
+                self.log("Processing completed successfully!")
+                return
+            
+            self.start_tracking(combining)
+            
+            # Step 1: Combine videos if requested
+            combined_file = None
+            if combining:
+                self.job_context.job = "combine"
+                combined_file = self.completed_stage("batch", journal.COMBINED)
+                if combined_file:
+                    self.log("Resuming with the combined video from the previous run")
+                else:
+                    self.log("Combining videos...")
+                    with self.stage("combined", "combine", self.input_files) as stage:
+                        combined_file = self.combine_videos(self.stage_temp_path("combine", temp_path))
+                        stage.output = combined_file
+                    if not isinstance(combined_file, ConcatInput):
+                        self.record_stage("batch", journal.COMBINED, combined_file)
+                # A stream copy or virtual combine is near instant and should not count as half the batch
+                if self.tracker.is_idle("combine"):
+                    self.tracker.remove("combine")
+                else:
+                    self.tracker.finish("combine")
+            
+            # Step 2: Process each file (or combined file)
+            files_to_process = [combined_file] if combined_file else self.input_files
+            
+            # Longest files first so a long encode never starts last and holds up the batch
+            files_to_process = sorted(files_to_process, key=self.processing_cost, reverse=True)
+            
+            workers = max(1, min(self.settings["max_workers"], len(files_to_process)))
+            self.encoder_threads = self.thread_budget(workers * self.parallel_runs)
+            self.superview.threads = self.encoder_threads
+            self.log(f"Processing {len(files_to_process)} file(s) with {workers} worker(s), "
+                     f"{self.encoder_threads or 'auto'} encoder thread(s) each")
+            
+            def run_job(index, file_path):
+                # Each job gets its own temp folder so files with the same name never collide
+                job_temp_path = temp_path / f"job{index + 1}"
+                job_temp_path.mkdir(exist_ok=True)
+                combined = file_path is combined_file
+                sources = self.input_files if combined else [file_path]
+                self.job_context.job = "combined" if combined else str(file_path)
+                if not self.fetch_cached_result(sources, file_path, output_path):
+                    final_path = self.process_file(file_path, index, len(files_to_process), job_temp_path, output_path)
+                    self.store_cached_result(sources, final_path)
+                self.tracker.finish(self.job_context.job)
+            
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(run_job, i, file_path) for i, file_path in enumerate(files_to_process)]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except Exception:
+                    # Stop queued files; files already encoding are allowed to finish
+                    for future in futures:
+                        future.cancel()
+                    raise
+            
+            self.finish_batch(temp_root, temp_path)
+            self.progress(100)
+            self.log("Stage summary:")
+            for line in metrics.describe_summary(self.metrics.finish()):
+                self.log(f"  {line}")
+            self.log("Processing completed successfully!")
+        finally:
+            # Also when the batch fails, so the journal is not left open until the process exits
+            self.close_journal()
+    
+    def open_metrics(self):
+        """Recorder for this run's stage metrics, written to logs/metrics-<time>.jsonl when enabled"""
+        path = None
+        if self.settings["metrics"]:
+            path = self.script_dir / "logs" / f"metrics-{time.strftime('%Y%m%d-%H%M%S')}-{self.batch[:8]}.jsonl"
+        return metrics.MetricsRecorder(path, run_id=self.batch)
+    
+    def stage(self, job, name, inputs=()):
+        """Context manager timing one stage of a job; set .output on it to the file it produced"""
+        files = []
+        for source in inputs:
+            files.extend(source.files if isinstance(source, ConcatInput) else [source])
+        return self.metrics.stage(os.path.basename(str(job)), name, files)
+    
+    def start_tracking(self, combining):
+        """Register every file with the progress tracker, weighted by duration"""
+        self.tracker = ProgressTracker(on_change=self.report_progress)
+        self.last_progress_log = time.monotonic()
+        durations = [self.duration_of(file_path) for file_path in self.input_files]
+        if all(durations):
+            weights = durations
+        else:
+            # Without ffprobe, file size is the best guess at how long a file takes
+            weights = [self.file_size(file_path) or 1 for file_path in self.input_files]
+            durations = [None] * len(self.input_files)
+        
+        passes = self.expected_passes()
+        if combining:
+            total_duration = sum(durations) if all(durations) else None
+            self.tracker.add("combine", "Combining", sum(weights), total_duration)
+            self.tracker.add("combined", "Combined video", sum(weights), total_duration, passes)
+        else:
+            for file_path, weight, duration in zip(self.input_files, weights, durations):
+                self.tracker.add(str(file_path), os.path.basename(file_path), weight, duration, passes)
+    
+    def expected_passes(self):
+        """Encodes per file: crop and Superview are one pass when fused"""
+        passes = int(self.settings["enable_crop"]) + int(self.settings["enable_superview"])
+        if passes == 2 and self.fuses_crop_and_superview():
+            passes = 1
+        return max(1, passes)
+    
+    def current_job(self):
+        return getattr(self.job_context, "job", None)
+    
+    def report_progress(self, tracker):
+        """Pass a progress update to the callbacks, with a summary in the log now and then"""
+        snapshot = tracker.snapshot()
+        self.progress(snapshot["percent"])
+        self.status(snapshot)
+        now = time.monotonic()
+        if now - self.last_progress_log >= PROGRESS_LOG_INTERVAL:
+            self.last_progress_log = now
+            self.log(f"Progress: {describe(snapshot)}")
+    
+    def log_output(self, label, line, job=None):
+        """Log a line of child process output and feed it to the progress tracker"""
+        self.log(f"{label}: {line}")
+        if self.tracker is not None:
+            self.tracker.observe(job if job is not None else self.current_job(), label, line)
+        stage = metrics.current_stage()
+        if stage is not None:
+            parsed = parse_progress(line)
+            if parsed and parsed[1]:
+                stage.add_fps(parsed[1])
+    
+    def process_file(self, file_path, index, total, temp_path, output_path):
+        """Crop and/or Superview one file, writing the result straight into the output folder"""
+        name = os.path.basename(file_path)
+        self.log(f"Processing file {index+1}/{total}: {name}")
+        
+        final_name = self.output_name(file_path)
+        final_path = output_path / final_name
+        if self.completed_stage(file_path, journal.MOVED) == str(final_path):
+            self.log(f"Already finished in the previous run: {final_name}")
+            return final_path
+        
+        # The last encode writes here, so finishing the file is a rename rather than a copy
+        partial_path = self.partial_path(final_path)
+        if self.should_split(total):
+            current_file = self.completed_stage(file_path, journal.SUPERVIEWED)
+            if not current_file:
+                current_file = self.transform_segmented(file_path, temp_path, output_file=partial_path)
+                self.record_stage(file_path, journal.SUPERVIEWED, current_file)
+        else:
+            current_file = self.transform_file(file_path, temp_path, item=file_path, output_file=partial_path)
+        
+        with self.stage(file_path, "move", [current_file]) as stage:
+            if Path(current_file) != partial_path:
+                # Unprocessed inputs and results resumed from temp still have to be brought over
+                shutil.move(current_file, partial_path)
+            os.replace(partial_path, final_path)
+            stage.output = final_path
+        self.record_stage(file_path, journal.MOVED, final_path)
+        self.log(f"Final file saved: {final_name}")
+        return final_path
+    
+    def transform_file(self, file_path, temp_path, item=None, output_file=None):
+        """Crop and/or Superview one file into temp_path, returning the result.
+
+        With an item, completed stages are recorded in the journal and skipped
+        when they were completed by an earlier run. With an output_file, the
+        last pass writes there instead of to temp_path.
+        """
+        name = os.path.basename(file_path)
+        current_file = file_path
+        fused = False
+        cropped = False
+        
+        if item is not None:
+            superviewed_file = self.completed_stage(item, journal.SUPERVIEWED)
+            if superviewed_file:
+                self.log(f"Resuming after Superview from the previous run: {name}")
+                return superviewed_file
+            cropped_file = self.completed_stage(item, journal.CROPPED)
+            if cropped_file:
+                self.log(f"Resuming after cropping from the previous run: {name}")
+                current_file = cropped_file
+                cropped = True
+        
+        # Crop and superview in one decode/encode pass when possible; the numpy engine always crops in that pass
+        if (self.settings["enable_crop"] and self.settings["enable_superview"]
+                and self.fuses_crop_and_superview() and not cropped):
+            try:
+                self.log(f"Cropping and applying Superview in a single pass: {name}")
+                with self.stage(name, "crop+superview", [current_file]) as stage:
+                    current_file = self.crop_and_superview(current_file, temp_path, output_file)
+                    stage.output = current_file
+                fused = True
+            except Exception as e:
+                self.log(f"Single-pass processing unavailable, falling back to two passes: {e}")
+        
+        # Otherwise run both passes at the same time, connected by a pipe instead of a temp file
+        if (self.settings["enable_crop"] and self.settings["enable_superview"] and not fused and not cropped
+                and self.can_stream_stages()):
+            try:
+                self.log(f"Cropping and applying Superview as streamed stages: {name}")
+                with self.stage(name, "crop+superview", [current_file]) as stage:
+                    current_file = self.crop_and_superview_streamed(current_file, temp_path, output_file)
+                    stage.output = current_file
+                fused = True
+            except Exception as e:
+                self.log(f"Streamed processing failed, falling back to separate passes: {e}")
+        
+        # Step 2a: Crop if enabled
+        if self.settings["enable_crop"] and not fused and not cropped:
+            self.log(f"Cropping video: {name}")
+            crop_temp_path = self.stage_temp_path("crop", temp_path)
+            with self.stage(name, "crop", [current_file]) as stage:
+                current_file = self.crop_video(self.materialize(current_file, crop_temp_path), crop_temp_path,
+                                               None if self.settings["enable_superview"] else output_file)
+                stage.output = current_file
+            if item is not None:
+                self.record_stage(item, journal.CROPPED, current_file)
+        
+        # Step 2b: Apply superview if enabled
+        if self.settings["enable_superview"] and not fused:
+            self.log(f"Applying Superview: {name}")
+            with self.stage(name, "superview", [current_file]) as stage:
+                current_file = self.apply_superview(current_file, self.stage_temp_path("superview", temp_path),
+                                                    output_file)
+                stage.output = current_file
+        
+        if item is not None and (fused or self.settings["enable_superview"]):
+            self.record_stage(item, journal.SUPERVIEWED, current_file)
+        return current_file
+    
+    def should_split(self, total):
+        """Split a file into segments when it would otherwise occupy a single worker"""
+        if not (self.settings["split_encode"] and total == 1
+                and (self.settings["enable_crop"] or self.settings["enable_superview"])):
+            return False
+        if self.find_tool("ffmpeg") is None:
+            self.log("Not splitting into segments: ffmpeg not found")
+            return False
+        if self.segment_workers() < 2:
+            self.log("Not splitting into segments: this machine has too few CPU cores to encode them in parallel")
+            return False
+        return True
+    
+    def segment_workers(self):
+        """Segments encoded at once: max_workers, or a share of the cores when that is 1"""
+        if self.settings["max_workers"] > 1:
+            return self.settings["max_workers"]
+        return max(1, min(MAX_SEGMENT_WORKERS, (os.cpu_count() or 1) // 2))
+    
+    def transform_segmented(self, input_file, temp_path, output_file=None):
+        """Cut a file at keyframes, transform the segments in parallel and stitch them losslessly"""
+        input_path = Path(input_file)
+        segment_dir = self.stage_temp_path("segments", temp_path) / "segments"
+        segment_dir.mkdir(exist_ok=True)
+        
+        with self.stage(input_file, "split", [input_file]) as stage:
+            segments = self.split_at_keyframes(input_file, segment_dir)
+            stage.output = segments
+        job = self.current_job()
+        if self.tracker is not None and job is not None:
+            self.tracker.split(job, [((job, i), self.probe_duration(segment)) for i, segment in enumerate(segments)])
+        workers = max(1, min(self.segment_workers(), len(segments)))
+        self.encoder_threads = self.thread_budget(workers)
+        self.superview.threads = self.encoder_threads
+        self.log(f"Encoding {len(segments)} segment(s) with {workers} worker(s), "
+                 f"{self.encoder_threads or 'auto'} encoder thread(s) each")
+        
+        def run_segment(index, segment):
+            # Segments get their own folder so fallback passes never collide
+            part_path = segment_dir / f"part{index + 1}"
+            part_path.mkdir(exist_ok=True)
+            self.job_context.job = (job, index)
+            return self.transform_file(segment, part_path)
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outputs = list(executor.map(run_segment, range(len(segments)), segments))
+        
+        output_file = Path(output_file or temp_path / f"{input_path.stem}-joined{input_path.suffix or '.mp4'}")
+        with self.stage(input_file, "join", outputs) as stage:
+            self.join_segments(outputs, output_file, segment_dir / "segment_list.txt")
+            stage.output = output_file
+        self.verify_segmented(input_file, output_file)
+        return str(output_file)
+    
+    def split_at_keyframes(self, input_file, segment_dir):
+        """Stream copy a file into segments of about segment_seconds, cut at keyframes"""
+        suffix = Path(input_file).suffix or ".mp4"
+        cmd = [
+            self.find_tool("ffmpeg"), "-hide_banner", "-v", "error", "-y",
+            *input_args(input_file),
+            "-map", "0:v", "-map", "0:a?",
+            "-c", "copy",
+            "-f", "segment",
+            "-segment_time", str(self.settings["segment_seconds"]),
+            "-reset_timestamps", "1",
+            str(segment_dir / f"segment_%04d{suffix}")
+        ]
+        self.log(f"Running split command: {' '.join(cmd)}")
+        self.run_logged_process(cmd, "Split")
+        
+        segments = sorted(str(path) for path in segment_dir.glob(f"segment_*{suffix}"))
+        if not segments:
+            raise Exception("Splitting produced no segments")
+        return segments
+    
+    def join_segments(self, segments, output_file, file_list_path):
+        """Stitch encoded segments back together with a stream copy"""
+        self.write_concat_list(file_list_path, segments)
+        
+        cmd = [
+            self.find_tool("ffmpeg"), "-hide_banner", "-v", "error", "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", str(file_list_path),
+            "-map", "0:v", "-map", "0:a?",
+            "-c", "copy",
+            str(output_file)
+        ]
+        self.log(f"Running join command: {' '.join(cmd)}")
+        try:
+            self.run_logged_process(cmd, "Join")
+        except Exception:
+            if output_file.exists():
+                output_file.unlink()
+            raise
+    
+    def probe_duration(self, source):
+        """Duration of a file in seconds, or None if it cannot be probed"""
+        ffprobe_path = self.find_tool("ffprobe")
+        if not ffprobe_path:
+            return None
+        cmd = [ffprobe_path, "-v", "error", "-show_entries", "format=duration", "-of", "json", str(source)]
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                                    stdin=subprocess.DEVNULL, startupinfo=self.get_startupinfo())
+            return float(json.loads(result.stdout)["format"]["duration"])
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def media_stats(self, source):
+        """Return (frame count, duration in seconds) of a file or virtual input"""
+        if isinstance(source, ConcatInput):
+            stats = [self.media_stats(file_path) for file_path in source.files]
+            return sum(frames for frames, _ in stats), sum(duration for _, duration in stats)
+        
+        ffprobe_path = self.find_tool("ffprobe")
+        if not ffprobe_path:
+            raise FileNotFoundError("ffprobe executable not found")
+        
+        cmd = [
+            ffprobe_path, "-v", "error",
+            "-select_streams", "v:0",
+            "-count_packets",
+            "-show_entries", "stream=nb_read_packets:format=duration",
+            "-of", "json",
+            str(source)
+        ]
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                                stdin=subprocess.DEVNULL, startupinfo=self.get_startupinfo())
+        if result.returncode != 0:
+            raise Exception(f"ffprobe failed: {result.stderr.strip()}")
+        
+        info = json.loads(result.stdout)
+        return int(info["streams"][0]["nb_read_packets"]), float(info["format"]["duration"])
+    
+    def verify_segmented(self, source, output_file):
+        """Check that the stitched output has the source's frame count and duration"""
+        source_frames, source_duration = self.media_stats(source)
+        output_frames, output_duration = self.media_stats(output_file)
+        
+        if source_frames != output_frames:
+            raise Exception(f"Segmented encode has {output_frames} frames, source has {source_frames}")
+        if abs(source_duration - output_duration) > SEGMENT_DURATION_TOLERANCE:
+            raise Exception(f"Segmented encode is {output_duration:.2f}s long, source is {source_duration:.2f}s")
+        
+        self.log(f"Segmented encode verified: {output_frames} frames, {output_duration:.2f}s")
+    
+    def open_journal(self, temp_root, temp_path):
+        """Open the resume journal, clean up abandoned temp folders and register this batch"""
+        if not self.settings["resume"]:
+            self.journal = None
+            return
+        self.journal = journal.Journal(self.script_dir / "cache" / "journal.sqlite")
+        
+        # Batches that were never resumed, and batch folders the journal does not know about
+        stage_roots = [Path(root) for root in self.settings["stage_temp_folders"].values() if root]
+        for path in self.journal.expire():
+            shutil.rmtree(path, ignore_errors=True)
+            for root in stage_roots:
+                shutil.rmtree(root / Path(path).name, ignore_errors=True)
+        active = {Path(path).name for path in self.journal.temp_paths()}
+        for root in [temp_root] + stage_roots:
+            for path in root.glob("batch-*"):
+                if path.name != temp_path.name and path.name not in active:
+                    self.log(f"Removing orphaned temp folder: {path}")
+                    shutil.rmtree(path, ignore_errors=True)
+        
+        if self.journal.begin(self.batch, temp_path):
+            self.log("Resuming an interrupted batch")
+            # Anything not recorded as a completed stage is a partial output
+            keep = self.journal.outputs(self.batch)
+            for folder in self.batch_temp_folders():
+                for path in sorted(folder.rglob("*"), reverse=True):
+                    if path.is_file() and str(path) not in keep:
+                        path.unlink()
+    
+    def finish_batch(self, temp_root, temp_path):
+        """Remove a finished batch's temp folders and journal entries"""
+        for folder in self.batch_temp_folders():
+            if folder.exists():
+                shutil.rmtree(folder)
+        try:
+            temp_root.rmdir()
+        except OSError:
+            pass  # Still in use by another batch
+        if self.journal is not None:
+            self.journal.finish(self.batch)
+        self.close_journal()
+    
+    def close_journal(self):
+        """Close the resume journal, if open"""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+    
+    def stage_temp_path(self, stage, temp_path):
+        """Folder for a stage's intermediate files: temp_path, or its counterpart in the stage's own temp folder"""
+        root = self.settings["stage_temp_folders"].get(stage)
+        if not root or self.batch_temp_path is None:
+            return temp_path
+        try:
+            relative = Path(temp_path).relative_to(self.batch_temp_path)
+        except ValueError:
+            return temp_path  # Already in another stage's folder, e.g. a segment's
+        path = Path(root) / self.batch_temp_path.name / relative
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+    
+    def batch_temp_folders(self):
+        """Every folder holding this batch's intermediate files"""
+        folders = [self.batch_temp_path]
+        for stage in TEMP_STAGES:
+            root = self.settings["stage_temp_folders"].get(stage)
+            if root and Path(root) / self.batch_temp_path.name not in folders:
+                folders.append(Path(root) / self.batch_temp_path.name)
+        return folders
+    
+    def partial_path(self, final_path):
+        """Hidden name a final output is written under until it is complete, unique to the writing thread"""
+        return final_path.with_name(f".{final_path.stem}.{os.getpid()}-{threading.get_ident()}.partial"
+                                    f"{final_path.suffix}")
+    
+    def remove_stale_partials(self, output_path):
+        """Delete partial outputs left in the output folder by runs that died"""
+        cutoff = time.time() - PARTIAL_MAX_AGE_SECONDS
+        for path in output_path.glob(".*.partial.*"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    self.log(f"Removing abandoned partial output: {path.name}")
+                    path.unlink()
+            except OSError:
+                pass
+    
+    def completed_stage(self, item, stage):
+        """Output of a stage completed by an earlier run of this batch, if it still exists"""
+        if self.journal is None:
+            return None
+        path = self.journal.completed(self.batch, item, stage)
+        if path and os.path.exists(path):
+            return path
+        return None
+    
+    def record_stage(self, item, stage, path):
+        if self.journal is not None:
+            self.journal.record(self.batch, item, stage, path)
+    
+    def result_options(self, sources):
+        """Settings that change the output of a job from sources, for the result cache and batch keys"""
+        options = {
+            "combine": self.settings["combine_videos"],
+            "crop": self.settings["crop_values"] if self.settings["enable_crop"] else None,
+            "superview": self.settings["superview_engine"] if self.settings["enable_superview"] else None,
+            "fused": self.settings["fused_pipeline"],
+            "encoder": self.superview.encoder_args if self.superview else None,
+        }
+        # An automatic crop is keyed by the crop detected for each source, so a changed profile is a new result
+        if options["crop"] is not None and self.auto_crop():
+            options["crop"] = [autocrop.format_crop(self.crops[str(source)]) if str(source) in self.crops else "auto"
+                               for source in sources]
+        # Only the numpy engine interpolates; leaving it out elsewhere keeps existing cache keys valid
+        if options["superview"] == "numpy":
+            options["interpolation"] = self.settings["superview_interpolation"]
+        return options
+    
+    def result_cache(self):
+        """The persistent result cache, or None when disabled"""
+        if not self.settings["result_cache"]:
+            return None
+        max_bytes = int(float(self.settings["result_cache_max_gb"]) * 1024 ** 3)
+        return ResultCache(self.script_dir / "cache" / "results", max_bytes)
+    
+    def fetch_cached_result(self, sources, file_path, output_path):
+        """Link a previously produced output for these sources into place; False on a miss"""
+        cache = self.result_cache()
+        if cache is None:
+            return False
+        
+        final_name = self.output_name(file_path)
+        try:
+            key = cache.key(sources, self.result_options(sources))
+            if cache.fetch(key, output_path / final_name):
+                self.log(f"Unchanged input, reused cached result: {final_name}")
+                return True
+        except OSError as e:
+            self.log(f"Could not check result cache: {e}")
+        return False
+    
+    def store_cached_result(self, sources, final_path):
+        """Add a finished output to the result cache"""
+        cache = self.result_cache()
+        if cache is None:
+            return
+        
+        try:
+            cache.store(cache.key(sources, self.result_options(sources)), final_path)
+        except OSError as e:
+            self.log(f"Could not add result to cache: {e}")
+    
+    def preflight(self, files):
+        """Probe every input before encoding; returns the files that can be processed.
+
+        Files that cannot be processed are skipped with a log message, or fail
+        the batch when skip_invalid_inputs is off.
+        """
+        crop = None
+        if self.settings["enable_crop"] and not self.auto_crop():
+            # Odd values would give odd frame sizes, which 4:2:0 encoders reject
+            crop = self.parse_crop_values()
+            requested = self.parse_crop_values(even=False)
+            if crop != requested:
+                self.log(f"Crop {autocrop.format_crop(requested)} rounded up to even values: "
+                         f"{autocrop.format_crop(crop)}")
+        
+        if self.find_tool("ffprobe") is None:
+            self.log("ffprobe not found, inputs are not checked before processing")
+            return list(files)
+        
+        self.probe_index = open_scan_index(self.script_dir) if self.settings["probe_cache"] else None
+        valid = []
+        rejected = []
+        for file_path in files:
+            problems = self.check_file(file_path, crop)
+            if problems:
+                rejected.append(f"{os.path.basename(file_path)}: {', '.join(problems)}")
+            else:
+                valid.append(file_path)
+        # Both caches are only a speed-up, so a failed save must not fail the batch
+        for name, cache in (("probe cache", self.probe_index), ("crop profiles", self.crop_profiles)):
+            if cache is not None:
+                try:
+                    cache.save()
+                except OSError as e:
+                    self.log(f"Could not save the {name}: {e}")
+        
+        if rejected and not self.settings["skip_invalid_inputs"]:
+            raise ValueError("Invalid input files:\n" + "\n".join(rejected))
+        for message in rejected:
+            self.log(f"Skipping {message}")
+        if not valid:
+            raise ValueError("No valid video files to process")
+        
+        sizes = {preflight.display_size(self.media_info[str(file_path)]) for file_path in valid}
+        if self.settings["combine_videos"] and len(sizes) > 1:
+            resolutions = ", ".join(f"{width}x{height}" for width, height in sorted(sizes))
+            self.log(f"Inputs have different resolutions ({resolutions}); combining them needs a re-encode")
+        crops = {self.crops[str(file_path)] for file_path in valid if str(file_path) in self.crops}
+        if self.settings["combine_videos"] and len(valid) > 1 and len(crops) > 1:
+            self.log(f"Inputs need different crops; the combined video uses "
+                     f"{autocrop.format_crop(self.crops[str(valid[0])])} from {os.path.basename(valid[0])}")
+        self.log(f"Checked {len(files)} input(s): {len(valid)} ok, {len(rejected)} skipped")
+        return valid
+    
+    def check_file(self, file_path, crop):
+        """Problems found by probing one input, as a list of messages"""
+        if not os.path.exists(file_path):
+            return ["file not found"]
+        if self.file_size(file_path) == 0:
+            return ["empty file"]
+        try:
+            summary = preflight.media_summary(self.probe(file_path, persist=True))
+        except Exception as e:
+            return [f"cannot be read ({e})"]
+        self.media_info[str(file_path)] = summary
+        if self.auto_crop() and summary["video"] and summary["width"] and summary["height"]:
+            try:
+                crop = self.detect_crop(file_path, summary)
+            except Exception as e:
+                return [f"crop detection failed ({e})"]
+        problems = preflight.check_input(summary, crop)
+        if not problems:
+            for warning in preflight.input_warnings(summary):
+                self.log(f"{os.path.basename(file_path)}: {warning}")
+        return problems
+    
+    def duration_of(self, file_path):
+        """Duration from the pre-flight probe, probing now if the file was not checked"""
+        summary = self.media_info.get(str(file_path))
+        if summary and summary["duration"]:
+            return summary["duration"]
+        return self.probe_duration(file_path)
+    
+    def processing_cost(self, file_path):
+        """Sort key estimating how long a file takes: its duration, then its size"""
+        summary = self.media_info.get(str(file_path)) or {}
+        return summary.get("duration") or 0, self.file_size(file_path)
+    
+    def file_size(self, file_path):
+        """Size of a file in bytes, 0 if it cannot be read"""
+        try:
+            return os.path.getsize(file_path)
+        except OSError:
+            return 0
+    
+    def thread_budget(self, workers):
+        """Encoder threads per worker so concurrent files share the CPU instead of oversubscribing it"""
+        if self.tier["threads"]:
+            return self.tier["threads"]
+        if workers <= 1:
+            return 0  # Let the encoder decide
+        return max(1, (os.cpu_count() or 1) // workers)
+    
+    def get_startupinfo(self):
+        """Get startupinfo to hide console windows on Windows"""
+        startupinfo = None
+        if os.name == 'nt':  # Windows
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo.wShowWindow = subprocess.SW_HIDE
+        return startupinfo
+    
+    def find_tool(self, name):
+        """Find an external tool next to the script or on the PATH"""
+        for candidate in (self.script_dir / f"{name}.exe", self.script_dir / name):
+            if candidate.exists():
+                return str(candidate)
+        return shutil.which(name)
+    
+    def parse_crop_values(self, even=True):
+        """Parse crop values (top:bottom:left:right format), rounded up to even values unless even is False"""
+        crop_parts = str(self.settings["crop_values"]).split(':')
+        if len(crop_parts) != 4:
+            raise ValueError("Crop values must be in format top:bottom:left:right")
+        
+        crop = tuple(map(int, crop_parts))
+        return autocrop.even_crop(crop) if even else crop
+    
+    def auto_crop(self):
+        """Whether crops are detected per file (crop_values "auto")"""
+        return self.settings["enable_crop"] and str(self.settings["crop_values"]).strip().lower() == "auto"
+    
+    def crop_for(self, input_file):
+        """Crop values for a file: the setting, or the crop detected for the input it came from"""
+        if not self.auto_crop():
+            return self.parse_crop_values()
+        # Intermediate files (combined video, segments) take the crop of their source
+        job = self.current_job()
+        if isinstance(job, tuple):
+            job = job[0]
+        source = self.input_files[0] if job in ("combine", "combined") and self.input_files else job
+        crop = self.crops.get(str(source)) if source is not None else None
+        if crop is None:
+            crop = self.detect_crop(input_file.files[0] if isinstance(input_file, ConcatInput) else input_file)
+        return crop
+    
+    def detect_crop(self, file_path, summary=None):
+        """Detect a file's black border, reusing the crop found for its camera profile"""
+        if summary is None:
+            summary = preflight.media_summary(self.probe(file_path))
+        width, height = preflight.display_size(summary)
+        key = autocrop.profile_key(summary.get("camera"), width, height)
+        with self.crop_lock:
+            if self.crop_profiles is None:
+                self.crop_profiles = shared_cache(autocrop.CropProfiles,
+                                                  self.script_dir / "cache" / "crop_profiles.json")
+            crop = self.crop_profiles.get(key)
+        
+        if crop is None:
+            ffmpeg_path = self.find_tool("ffmpeg")
+            if not ffmpeg_path:
+                raise FileNotFoundError("ffmpeg executable not found")
+            frames = autocrop.sample_frames(ffmpeg_path, file_path, width, height, summary["duration"],
+                                            startupinfo=self.get_startupinfo())
+            crop = autocrop.detect_crop(frames, width, height)
+            with self.crop_lock:
+                self.crop_profiles.set(key, crop, source=file_path)
+            self.log(f"Detected crop {autocrop.format_crop(crop)} for {os.path.basename(str(file_path))} "
+                     f"({key or f'unknown camera, {width}x{height}'})")
+        self.crops[str(file_path)] = crop
+        return crop
+    
+    def probe(self, input_file, persist=False):
+        """ffprobe streams and format of a file, cached by path, size and mtime.
+        
+        With persist, the result is also kept in the scan index for later runs.
+        """
+        path = os.path.abspath(str(input_file))
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        with self.probe_lock:
+            info = self.probe_results.get(key)
+        if info is not None:
+            return info
+        
+        index = self.probe_index if persist else None
+        if index is not None:
+            info = index.metadata(path, stat.st_size, stat.st_mtime_ns)
+            # Results probed for fewer entries are probed again
+            if info is not None and info.get("probe_entries") != preflight.PROBE_ENTRIES:
+                info = None
+        if info is None:
+            info = self.run_ffprobe(path)
+            info["probe_entries"] = preflight.PROBE_ENTRIES
+            if index is not None:
+                index.set_metadata(path, stat.st_size, stat.st_mtime_ns, info)
+        with self.probe_lock:
+            self.probe_results[key] = info
+        return info
+    
+    def run_ffprobe(self, input_file):
+        ffprobe_path = self.find_tool("ffprobe")
+        if not ffprobe_path:
+            raise FileNotFoundError("ffprobe executable not found")
+        
+        cmd = [
+            ffprobe_path, "-v", "error",
+            "-show_entries", preflight.PROBE_ENTRIES,
+            "-of", "json",
+            str(input_file)
+        ]
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                                stdin=subprocess.DEVNULL, startupinfo=self.get_startupinfo())
+        if result.returncode != 0:
+            raise Exception(f"ffprobe failed: {result.stderr.strip()}")
+        
+        return json.loads(result.stdout)
+    
+    def probe_streams(self, input_file):
+        """Return the ffprobe stream list of a file"""
+        return self.probe(input_file).get("streams", [])
+    
+    def probe_video(self, input_file):
+        """Return width, height and fps of the first video stream using ffprobe.
+        
+        The size is the displayed one: ffmpeg rotates frames on decode, so
+        that is the size crops, maps and frame buffers must fit.
+        """
+        if isinstance(input_file, ConcatInput):
+            # Segments are only combined virtually when their streams match
+            input_file = input_file.files[0]
+        
+        for stream in self.probe_streams(input_file):
+            if stream.get("codec_type") == "video":
+                width, height = int(stream["width"]), int(stream["height"])
+                if preflight.rotation_of(stream) in (90, 270):
+                    width, height = height, width
+                return {
+                    "width": width,
+                    "height": height,
+                    "fps": stream.get("r_frame_rate", "30/1")
+                }
+        raise Exception(f"No video stream found in {os.path.basename(input_file)}")
+    
+    def stream_signature(self, input_file):
+        """Codec parameters that must match for files to be joined without re-encoding"""
+        signature = []
+        for stream in self.probe_streams(input_file):
+            if stream.get("codec_type") == "video":
+                signature.append(("video", stream.get("codec_name"), stream.get("profile"),
+                                  stream.get("width"), stream.get("height"), stream.get("pix_fmt"),
+                                  stream.get("r_frame_rate"), stream.get("time_base")))
+            elif stream.get("codec_type") == "audio":
+                signature.append(("audio", stream.get("codec_name"), stream.get("sample_rate"),
+                                  stream.get("channels"), stream.get("time_base")))
+        return signature
+    
+    def can_stream_copy(self, files):
+        """Check that all files share codec, resolution, frame rate and timebase"""
+        try:
+            first = self.stream_signature(files[0])
+            if not any(stream[0] == "video" for stream in first):
+                return False
+            for file_path in files[1:]:
+                if self.stream_signature(file_path) != first:
+                    self.log(f"Stream parameters of {os.path.basename(file_path)} differ from "
+                             f"{os.path.basename(files[0])}, re-encoding instead")
+                    return False
+        except Exception as e:
+            self.log(f"Could not probe inputs for stream copy: {e}")
+            return False
+        return True
+    
+    def run_logged_process(self, cmd, label):
+        """Run a command, forwarding its output to the log, and raise on failure"""
+        # Use Popen for real-time output with hidden window
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
+                                 text=True, cwd=str(self.script_dir), bufsize=1, universal_newlines=True,
+                                 startupinfo=self.get_startupinfo())
+        
+        for line in process.stdout:
+            if line.strip():
+                self.log_output(label, line.strip())
+        
+        metrics.wait(process)
+        
+        if process.returncode != 0:
+            raise Exception(f"{label} failed with return code {process.returncode}")
+    
+    def forward_output(self, stream, label, job=None, stage=None):
+        """Log each line a child process writes to stream"""
+        metrics.set_current_stage(stage)
+        # Universal newlines, since encoders end progress lines with a bare carriage return
+        for line in io.TextIOWrapper(stream, errors='replace'):
+            line = line.strip()
+            if line:
+                self.log_output(label, line, job)
+        stream.close()
+    
+    def run_stream_chain(self, stages):
+        """Run (label, cmd) stages concurrently, each reading the previous stage's stdout.
+        
+        Nothing touches the disk between stages and the chain takes as long as
+        its slowest stage. Raises if any stage fails.
+        """
+        processes = []
+        readers = []
+        upstream = None
+        for i, (label, cmd) in enumerate(stages):
+            self.log(f"Running {label} stage: {' '.join(cmd)}")
+            last = i == len(stages) - 1
+            # The first stage gets no stdin, so ffmpeg never reads keypresses from the terminal
+            process = subprocess.Popen(cmd, stdin=upstream or subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                       stdout=subprocess.DEVNULL if last else subprocess.PIPE,
+                                       cwd=str(self.script_dir), startupinfo=self.get_startupinfo())
+            if upstream is not None:
+                # Only the next stage holds the pipe, so a failure downstream stops the upstream stage
+                upstream.close()
+            upstream = process.stdout
+            processes.append((label, process))
+            
+            reader = threading.Thread(target=self.forward_output,
+                                      args=(process.stderr, label, self.current_job(), metrics.current_stage()),
+                                      daemon=True)
+            reader.start()
+            readers.append(reader)
+        
+        for label, process in processes:
+            metrics.wait(process)
+        for reader in readers:
+            reader.join()
+        
+        for label, process in processes:
+            if process.returncode != 0:
+                raise Exception(f"{label} failed with return code {process.returncode}")
+    
+    def create_superview_engine(self):
+        """Create the in-process Superview engine for a processing run"""
+        # Remap tables live in a persistent cache next to the script, shared by every run
+        map_dir = self.script_dir / "cache" / "superview"
+        return SuperviewEngine(map_dir, bundled_dir=self.script_dir, encoder_args=ffmpeg_encoder_args(self.tier),
+                               threads=self.encoder_threads, log=self.log,
+                               interpolation=self.settings["superview_interpolation"])
+    
+    def warp_video(self, input_file, output_file, crop=None, warp=True):
+        """Apply the Superview warp (optionally cropping first) with the native engine.
+        
+        Without warp the numpy engine only crops, in its frame pipeline.
+        """
+        if self.settings["superview_engine"] not in SuperviewEngine.BACKENDS:
+            raise ValueError(f"The {self.settings['superview_engine']} engine has no native warp")
+        ffmpeg_path = self.find_tool("ffmpeg")
+        if not ffmpeg_path:
+            raise FileNotFoundError("ffmpeg executable not found")
+        
+        info = self.probe_video(input_file)
+        
+        try:
+            if self.settings["superview_engine"] == "numpy":
+                # The encoder's progress is read on another thread, so pass the job and stage along
+                job, stage = self.current_job(), metrics.current_stage()
+                self.superview.warp_video(ffmpeg_path, input_file, output_file,
+                                          info["width"], info["height"], info["fps"], crop=crop, warp=warp,
+                                          output=lambda stream, label: self.forward_output(stream, label, job, stage))
+            else:
+                cmd = self.superview.ffmpeg_command(ffmpeg_path, input_file, output_file,
+                                                    info["width"], info["height"], crop=crop)
+                self.log(f"Running Superview command: {' '.join(cmd)}")
+                self.run_logged_process(cmd, "ffmpeg")
+        except Exception:
+            if Path(output_file).exists():
+                Path(output_file).unlink()
+            raise
+        
+        return str(output_file)
+    
+    def crop_and_superview(self, input_file, temp_path, output_file=None):
+        """Crop and apply Superview in a single decode/encode pass"""
+        input_path = Path(input_file)
+        output_file = Path(output_file or temp_path / f"{input_path.stem}-cropped-superview{input_path.suffix}")
+        
+        try:
+            return self.warp_video(input_file, output_file, crop=self.crop_for(input_file))
+        except Exception as e:
+            raise Exception(f"Single-pass processing failed: {e}")
+    
+    def write_concat_list(self, path, files):
+        """Write an ffmpeg concat demuxer list of files"""
+        with open(path, 'w') as f:
+            for file_path in files:
+                # Escape single quotes as the concat demuxer expects
+                escaped = str(Path(file_path).absolute()).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+    
+    def combine_videos(self, temp_path):
+        """Combine the input files, losslessly when their streams are compatible"""
+        if self.settings["stream_copy_combine"] and self.find_tool("ffmpeg") and self.can_stream_copy(self.input_files):
+            if self.settings["virtual_combine"] and self.warps_with_ffmpeg():
+                # The warp encoder reads the segments directly, so nothing needs to be written
+                file_list_path = temp_path / "concat_list.txt"
+                self.write_concat_list(file_list_path, self.input_files)
+                self.log("Combined videos will be streamed straight into the encoder")
+                return ConcatInput(self.input_files, file_list_path, temp_path / "combined.mp4")
+            
+            try:
+                return self.combine_videos_copy(temp_path)
+            except Exception as e:
+                self.log(f"Stream copy failed, re-encoding instead: {e}")
+        
+        return self.combine_videos_handbrake(temp_path)
+    
+    def warps_with_ffmpeg(self):
+        """Whether every file goes straight into an ffmpeg-based Superview encode"""
+        return (self.settings["enable_superview"]
+                and self.settings["superview_engine"] in SuperviewEngine.BACKENDS
+                and (self.settings["fused_pipeline"] or not self.settings["enable_crop"]
+                     or self.crops_in_frame_pipeline() or self.can_stream_stages()))
+    
+    def fuses_crop_and_superview(self):
+        """Whether crop and Superview are one pass of an in-process engine (never with superview-cli)"""
+        return (self.settings["superview_engine"] in SuperviewEngine.BACKENDS
+                and (self.settings["fused_pipeline"] or self.crops_in_frame_pipeline()))
+    
+    def crops_in_frame_pipeline(self):
+        """Whether crops are applied to decoded frames in-process instead of by a HandBrake encode"""
+        return (self.settings["superview_engine"] == "numpy"
+                and SuperviewEngine.frame_pipeline_available()
+                and self.find_tool("ffmpeg") is not None)
+    
+    def can_stream_stages(self):
+        """Whether crop and Superview can run as two ffmpeg processes joined by a pipe"""
+        return (self.settings["stream_stages"]
+                and self.settings["superview_engine"] == "ffmpeg"
+                and self.find_tool("ffmpeg") is not None)
+    
+    def materialize(self, source, temp_path):
+        """Return a real file for a stage that cannot read virtual inputs"""
+        if isinstance(source, ConcatInput):
+            self.log("Writing combined video for a stage that needs a file...")
+            return self.combine_videos_copy(temp_path)
+        return source
+    
+    def combine_videos_copy(self, temp_path):
+        """Join the input files with ffmpeg's concat demuxer without re-encoding"""
+        file_list_path = temp_path / "concat_list.txt"
+        self.write_concat_list(file_list_path, self.input_files)
+        
+        output_file = temp_path / "combined.mp4"
+        cmd = [
+            self.find_tool("ffmpeg"), "-hide_banner", "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", str(file_list_path),
+            "-map", "0:v", "-map", "0:a?",
+            "-c", "copy",
+            str(output_file)
+        ]
+        
+        self.log(f"Running stream copy command: {' '.join(cmd)}")
+        try:
+            self.run_logged_process(cmd, "ffmpeg")
+        except Exception:
+            if output_file.exists():
+                output_file.unlink()
+            raise
+        
+        return str(output_file)
+    
+    def crop_and_superview_streamed(self, input_file, temp_path, output_file=None):
+        """Crop and Superview as two concurrent ffmpeg stages joined by a raw video pipe"""
+        input_path = Path(input_file)
+        output_file = Path(output_file or temp_path / f"{input_path.stem}-cropped-superview{input_path.suffix}")
+        
+        ffmpeg_path = self.find_tool("ffmpeg")
+        info = self.probe_video(input_file)
+        crop_width, crop_height, crop_filter = crop_filter_for(info["width"], info["height"],
+                                                              self.crop_for(input_file))
+        
+        # Uncompressed frames in a NUT container keep the pipe cheap to produce and lossless.
+        # -stats keeps the crop's progress lines, since it counts as one of the file's two passes
+        crop_cmd = [
+            ffmpeg_path, "-hide_banner", "-v", "error", "-stats",
+            *input_args(input_file),
+            "-map", "0:v", "-map", "0:a?",
+            "-vf", crop_filter,
+            "-c:v", "rawvideo",
+            "-c:a", "copy",
+            "-f", "nut", "pipe:1"
+        ]
+        warp_cmd = self.superview.ffmpeg_command(ffmpeg_path, PipeInput(input_path), output_file,
+                                                 crop_width, crop_height)
+        
+        try:
+            self.run_stream_chain([("Crop", crop_cmd), ("Superview", warp_cmd)])
+        except Exception:
+            if output_file.exists():
+                output_file.unlink()
+            raise
+        
+        return str(output_file)
+    
+    def combine_videos_handbrake(self, temp_path):
+        # Create a file list for HandBrake
+        file_list_path = temp_path / "file_list.txt"
+        with open(file_list_path, 'w') as f:
+            for file_path in self.input_files:
+                f.write(f"file '{file_path}'\n")
+        
+        output_file = temp_path / "combined.mp4"
+        
+        # Use HandBrake to combine videos - use full path to executable
+        handbrake_path = Path(self.find_tool("HandBrakeCLI") or self.script_dir / "HandBrakeCLI.exe")
+        
+        # Check if executable exists
+        if not handbrake_path.exists():
+            raise FileNotFoundError(f"HandBrake executable not found at: {handbrake_path}")
+        
+        cmd = [
+            str(handbrake_path),
+            "--input-list", str(file_list_path),
+            "--output", str(output_file),
+            "--format", "mp4",
+            *handbrake_encoder_args(self.tier, self.encoder_threads)
+        ]
+        
+        self.log(f"Running HandBrake command: {' '.join(cmd)}")
+        self.log(f"Working directory: {os.getcwd()}")
+        self.log(f"HandBrake path exists: {handbrake_path.exists()}")
+        
+        try:
+            # Use Popen for real-time output with hidden window
+            process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
+                                     text=True, cwd=str(self.script_dir), bufsize=1, universal_newlines=True,
+                                     startupinfo=self.get_startupinfo())
+            
+            for line in process.stdout:
+                if line.strip():
+                    self.log_output("HandBrake", line.strip())
+            
+            metrics.wait(process)
+            
+            if process.returncode != 0:
+                raise Exception(f"HandBrake failed with return code {process.returncode}")
+                
+        except FileNotFoundError as e:
+            raise Exception(f"HandBrake executable not found: {e}")
+        except Exception as e:
+            raise Exception(f"HandBrake failed: {e}")
+        
+        return str(output_file)
+    
+    def crop_video(self, input_file, temp_path, output_file=None):
+        input_path = Path(input_file)
+        output_file = Path(output_file or temp_path / f"{input_path.stem}-cropped{input_path.suffix}")
+        
+        if self.crops_in_frame_pipeline():
+            self.log(f"Cropping decoded frames in-process: {input_path.name}")
+            try:
+                return self.warp_video(input_file, output_file, crop=self.crop_for(input_file), warp=False)
+            except Exception as e:
+                raise Exception(f"Crop failed: {e}")
+        
+        top, bottom, left, right = self.crop_for(input_file)
+        
+        # Use HandBrake for cropping - use full path to executable
+        handbrake_path = Path(self.find_tool("HandBrakeCLI") or self.script_dir / "HandBrakeCLI.exe")
+        
+        # Check if executable exists
+        if not handbrake_path.exists():
+            raise FileNotFoundError(f"HandBrake executable not found at: {handbrake_path}")
+        
+        cmd = [
+            str(handbrake_path),
+            "--input", str(input_file),
+            "--output", str(output_file),
+            "--format", "mp4",
+            *handbrake_encoder_args(self.tier, self.encoder_threads),
+            "--crop", f"{top}:{bottom}:{left}:{right}"
+        ]
+        
+        self.log(f"Running crop command: {' '.join(cmd)}")
+        self.log(f"Working directory: {os.getcwd()}")
+        self.log(f"HandBrake path exists: {handbrake_path.exists()}")
+        
+        try:
+            # Use Popen for real-time output with hidden window
+            process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
+                                     text=True, cwd=str(self.script_dir), bufsize=1, universal_newlines=True,
+                                     startupinfo=self.get_startupinfo())
+            
+            for line in process.stdout:
+                if line.strip():
+                    self.log_output("Crop", line.strip())
+            
+            metrics.wait(process)
+            
+            if process.returncode != 0:
+                raise Exception(f"Crop failed with return code {process.returncode}")
+                
+        except FileNotFoundError as e:
+            raise Exception(f"HandBrake executable not found: {e}")
+        except Exception as e:
+            raise Exception(f"Crop failed: {e}")
+        
+        return str(output_file)
+    
+    def apply_superview(self, input_file, temp_path, output_file=None):
+        input_path = Path(input_file)
+        output_file = Path(output_file or temp_path / f"{input_path.stem}-superview{input_path.suffix}")
+        
+        # Prefer the native engine; superview-cli is only used when selected or ffmpeg is missing
+        if self.settings["superview_engine"] != "superview-cli" and self.find_tool("ffmpeg"):
+            try:
+                return self.warp_video(input_file, output_file)
+            except Exception as e:
+                raise Exception(f"Superview failed: {e}")
+        
+        input_file = self.materialize(input_file, temp_path)
+        
+        # Use superview-cli - use full path to executable
+        superview_path = Path(self.find_tool("superview-cli") or self.script_dir / "superview-cli.exe")
+        
+        # Check if executable exists
+        if not superview_path.exists():
+            raise FileNotFoundError(f"Superview executable not found at: {superview_path}")
+        
+        cmd = [
+            str(superview_path),
+            "/i", str(input_file),
+            "/o", str(output_file)
+        ]
+        
+        self.log(f"Running Superview command: {' '.join(cmd)}")
+        self.log(f"Working directory: {os.getcwd()}")
+        self.log(f"Superview path exists: {superview_path.exists()}")
+        
+        try:
+            # Use Popen for real-time output with hidden window
+            process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
+                                     text=True, cwd=str(self.script_dir), bufsize=1, universal_newlines=True,
+                                     startupinfo=self.get_startupinfo())
+            
+            for line in process.stdout:
+                if line.strip():
+                    self.log_output("Superview", line.strip())
+            
+            metrics.wait(process)
+            
+            if process.returncode != 0:
+                raise Exception(f"Superview failed with return code {process.returncode}")
+                
+        except FileNotFoundError as e:
+            raise Exception(f"Superview executable not found: {e}")
+        except Exception as e:
+            raise Exception(f"Superview failed: {e}")
+        
+        return str(output_file)
+    
+    def unique_output_names(self, files):
+        """Output name of every input, with the folder name added where inputs share a name"""
+        names = {}
+        taken = set()
+        for file_path in files:
+            name = self.generate_output_name(file_path)
+            if name.lower() in taken:
+                # e.g. 100GOPRO/GX010001.MP4 and 101GOPRO/GX010001.MP4
+                path = Path(file_path)
+                renamed = path.with_name(f"{path.stem}-{path.parent.name}{path.suffix}")
+                name = self.generate_output_name(renamed)
+                number = 2
+                while name.lower() in taken:
+                    name = self.generate_output_name(renamed.with_name(f"{renamed.stem}-{number}{path.suffix}"))
+                    number += 1
+                self.log(f"{path} has the same name as another input, saving it as {name}")
+            taken.add(name.lower())
+            names[str(file_path)] = name
+        return names
+    
+    def output_name(self, input_file):
+        """Final name of a file processed in this batch"""
+        return self.output_names.get(str(input_file)) or self.generate_output_name(input_file)
+    
+    def generate_output_name(self, input_file):
+        input_path = Path(input_file)
+        base_name = input_path.stem
+        
+        # Add suffixes based on processing steps
+        if self.settings["combine_videos"] and len(self.input_files) > 1:
+            base_name += "-combined"
+        
+        if self.settings["enable_crop"]:
+            base_name += "-cropped"
+        
+        if self.settings["enable_superview"]:
+            base_name += "-superview"
+        
+        return f"{base_name}{input_path.suffix}"
@@ -0,0 +1,114 @@
+"""Pre-flight checks of input files.
+
+Every input is probed once before any encoding starts, so corrupt,
+zero-length or unsupported files and crops that do not fit are reported
+up front instead of after minutes of encoding. The probe result (ffprobe's
+stream and format entries) is cached per file by size and mtime.
+"""
+
+# ffprobe entries kept for each file: enough for validation, ETA, stream copy checks, crop validation
+# and telling cameras apart for automatic crop profiles
+PROBE_ENTRIES = ("format=duration:"
+                 "format_tags=make,model,com.apple.quicktime.make,com.apple.quicktime.model,firmware:"
+                 "stream=index,codec_type,codec_name,profile,width,height,pix_fmt,r_frame_rate,avg_frame_rate,"
+                 "time_base,sample_rate,channels:"
+                 "stream_tags=rotate:"
+                 "stream_side_data=rotation")
+
+# Video codecs known to decode reliably with HandBrake and ffmpeg; others are processed with a warning
+TESTED_VIDEO_CODECS = {
+    "h264", "hevc", "mpeg4", "mpeg2video", "mpeg1video", "prores", "dnxhd", "mjpeg", "vp8", "vp9", "av1",
+    "wmv3", "vc1", "flv1", "h263",
+}
+
+
+def parse_rate(rate):
+    """Frames per second from an ffprobe rational such as 60000/1001"""
+    try:
+        numerator, _, denominator = str(rate).partition("/")
+        value = float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return value if value > 0 else None
+
+
+def rotation_of(stream):
+    """Display rotation of a video stream in degrees, 0, 90, 180 or 270"""
+    rotation = stream.get("tags", {}).get("rotate")
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            rotation = side_data["rotation"]
+    try:
+        return int(round(float(rotation or 0))) % 360
+    except ValueError:
+        return 0
+
+
+def camera_model(info):
+    """Camera make and model from a file's tags, or None"""
+    tags = {key.lower(): str(value).strip() for key, value in info.get("format", {}).get("tags", {}).items()}
+    make = tags.get("com.apple.quicktime.make") or tags.get("make")
+    model = tags.get("com.apple.quicktime.model") or tags.get("model")
+    if model:
+        return f"{make} {model}" if make and not model.startswith(make) else model
+    # GoPro writes no model tag, but its firmware version starts with the model (e.g. HD9.01.01.60.00)
+    firmware = tags.get("firmware")
+    if firmware:
+        return f"firmware {firmware.split('.')[0]}"
+    return None
+
+
+def media_summary(info):
+    """Duration, resolution, codec, fps and rotation of a probed file"""
+    video = next((stream for stream in info.get("streams", []) if stream.get("codec_type") == "video"), None)
+    audio = next((stream for stream in info.get("streams", []) if stream.get("codec_type") == "audio"), None)
+    try:
+        duration = float(info.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+
+    summary = {"duration": duration, "video": video is not None, "audio": audio.get("codec_name") if audio else None,
+               "camera": camera_model(info)}
+    if video is not None:
+        summary.update({
+            "codec": video.get("codec_name"),
+            "width": int(video.get("width") or 0),
+            "height": int(video.get("height") or 0),
+            "fps": parse_rate(video.get("avg_frame_rate")) or parse_rate(video.get("r_frame_rate")),
+            "rotation": rotation_of(video),
+        })
+    return summary
+
+
+def display_size(summary):
+    """Width and height after rotation, as decoders hand frames to the crop"""
+    if summary.get("rotation") in (90, 270):
+        return summary["height"], summary["width"]
+    return summary["width"], summary["height"]
+
+
+def check_input(summary, crop=None):
+    """Problems that would make processing a file fail, as a list of messages"""
+    if not summary["video"]:
+        return ["no video stream"]
+    problems = []
+    # ffprobe names every codec it has a decoder for
+    if not summary["codec"] or summary["codec"] == "unknown":
+        problems.append("no decoder for the video codec")
+    if not summary["width"] or not summary["height"]:
+        problems.append("unknown resolution")
+    if not summary["duration"] or summary["duration"] <= 0:
+        problems.append("no duration (file may be truncated)")
+    if crop is not None and summary["width"] and summary["height"]:
+        top, bottom, left, right = crop
+        width, height = display_size(summary)
+        if min(crop) < 0 or width - left - right < 2 or height - top - bottom < 2:
+            problems.append(f"crop {top}:{bottom}:{left}:{right} does not fit {width}x{height}")
+    return problems
+
+
+def input_warnings(summary):
+    """Things worth reporting about a file that can still be processed"""
+    if summary["video"] and summary["codec"] and summary["codec"] not in TESTED_VIDEO_CODECS:
+        return [f"video codec {summary['codec']} is not commonly tested, processing it anyway"]
+    return []
@@ -0,0 +1,207 @@
+"""Batch progress parsed from encoder output.
+
+HandBrake reports "Encoding: task 1 of 1, 45.23 % (120.5 fps, avg 110.2 fps,
+ETA 00h05m12s)" and ffmpeg "frame= 2400 fps=118 ... time=00:01:20.00 ...".
+Each line updates the fraction done of the file being encoded; files are
+weighted by source duration, so the batch percentage and ETA reflect how much
+video is left rather than how many files.
+"""
+import re
+import threading
+import time
+
+HANDBRAKE_PROGRESS = re.compile(r"Encoding: task (\d+) of (\d+), ([\d.]+) %(?: \(([\d.]+) fps)?")
+FFMPEG_PROGRESS = re.compile(r"frame=\s*\d+.*?fps=\s*([\d.]+).*?time=\s*(\d+):(\d+):([\d.]+)")
+
+
+def parse_progress(line, duration=None):
+    """(fraction done, fps) from a HandBrake or ffmpeg progress line, or None.
+
+    ffmpeg only reports the position it reached, so its fraction needs the
+    source duration; it is None when that is unknown.
+    """
+    match = HANDBRAKE_PROGRESS.search(line)
+    if match:
+        task, tasks, percent, fps = match.groups()
+        fraction = (int(task) - 1 + float(percent) / 100) / max(1, int(tasks))
+        return min(1.0, fraction), float(fps) if fps else None
+
+    match = FFMPEG_PROGRESS.search(line)
+    if match:
+        fps, hours, minutes, seconds = match.groups()
+        position = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+        fraction = min(1.0, position / duration) if duration else None
+        return fraction, float(fps)
+
+    return None
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class JobProgress:
+    def __init__(self, name, weight, duration=None, passes=1):
+        self.name = name
+        self.weight = weight
+        self.duration = duration
+        self.passes = passes
+        self.fractions = {}
+        self.fps = None
+        self.started = None
+        self.finished = False
+        self.children = []
+
+
+class ProgressTracker:
+    """Fraction done, throughput and ETA of each file and of the whole batch"""
+
+    def __init__(self, on_change=None, clock=time.monotonic):
+        self.on_change = on_change or (lambda tracker: None)
+        self.clock = clock
+        self.started = clock()
+        self._jobs = {}
+        self._order = []
+        self._lock = threading.RLock()
+
+    def add(self, key, name, weight, duration=None, passes=1):
+        """Register a file; weight is its share of the batch (usually its duration)"""
+        with self._lock:
+            self._jobs[key] = JobProgress(name, weight, duration, passes)
+            self._order.append(key)
+
+    def remove(self, key):
+        with self._lock:
+            if self._jobs.pop(key, None) is not None:
+                self._order.remove(key)
+        self.on_change(self)
+
+    def is_idle(self, key):
+        """Whether a job never reported any progress"""
+        with self._lock:
+            job = self._jobs.get(key)
+            return job is not None and job.started is None
+
+    def split(self, key, parts):
+        """Track a job as parts encoded separately; parts is a list of (sub key, duration)"""
+        with self._lock:
+            job = self._jobs[key]
+            total = sum(duration or 0 for _, duration in parts)
+            for sub_key, duration in parts:
+                share = duration / total if total else 1 / len(parts)
+                self._jobs[sub_key] = JobProgress(job.name, job.weight * share, duration, job.passes)
+                job.children.append(sub_key)
+
+    def observe(self, key, label, line):
+        """Update a job from one line of encoder output; returns True if it was a progress line"""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return False
+            parsed = parse_progress(line, job.duration)
+            if parsed is None:
+                return False
+            fraction, fps = parsed
+            if job.started is None:
+                job.started = self.clock()
+            if fraction is not None:
+                job.fractions[label] = fraction
+            if fps is not None:
+                job.fps = fps
+        self.on_change(self)
+        return True
+
+    def finish(self, key):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return
+            job.finished = True
+            for sub_key in job.children:
+                self._jobs[sub_key].finished = True
+        self.on_change(self)
+
+    def _fraction(self, job):
+        if job.finished:
+            return 1.0
+        if job.children:
+            children = [self._jobs[sub_key] for sub_key in job.children]
+            weight = sum(child.weight for child in children)
+            return sum(child.weight * self._fraction(child) for child in children) / weight if weight else 0.0
+        if not job.fractions:
+            return 0.0
+        # Passes run one after another (crop, then Superview) or side by side when streamed
+        return min(1.0, sum(job.fractions.values()) / max(job.passes, len(job.fractions)))
+
+    def _started(self, job):
+        times = [self._jobs[sub_key].started for sub_key in job.children] + [job.started]
+        times = [t for t in times if t is not None]
+        return min(times) if times else None
+
+    def _fps(self, job):
+        if job.finished:
+            return None
+        if job.children:
+            rates = [self._fps(self._jobs[sub_key]) for sub_key in job.children]
+            rates = [rate for rate in rates if rate]
+            return sum(rates) if rates else None
+        return job.fps if job.started is not None else None
+
+    def snapshot(self):
+        """Progress of the batch and of each file as a dict"""
+        now = self.clock()
+        with self._lock:
+            files = []
+            total_weight = 0.0
+            done_weight = 0.0
+            batch_fps = 0.0
+            for key in self._order:
+                job = self._jobs[key]
+                fraction = self._fraction(job)
+                started = self._started(job)
+                fps = self._fps(job)
+                eta = None
+                if job.finished:
+                    eta = 0.0
+                elif started is not None and fraction > 0:
+                    eta = (now - started) * (1 - fraction) / fraction
+                files.append({
+                    "name": job.name,
+                    "percent": fraction * 100,
+                    "fps": fps,
+                    "eta": eta,
+                    "finished": job.finished,
+                })
+                total_weight += job.weight
+                done_weight += job.weight * fraction
+                batch_fps += fps or 0
+
+        elapsed = now - self.started
+        eta = None
+        if total_weight and done_weight >= total_weight:
+            eta = 0.0
+        elif done_weight > 0:
+            eta = elapsed * (total_weight - done_weight) / done_weight
+        return {
+            "percent": done_weight / total_weight * 100 if total_weight else 0.0,
+            "fps": batch_fps or None,
+            "eta": eta,
+            "elapsed": elapsed,
+            "files": files,
+        }
+
+
+def describe(snapshot):
+    """One line summary of a snapshot for the log or a status bar"""
+    parts = [f"{snapshot['percent']:.1f}%"]
+    if snapshot["fps"]:
+        parts.append(f"{snapshot['fps']:.0f} fps")
+    parts.append(f"ETA {format_eta(snapshot['eta'])}")
+    active = [f for f in snapshot["files"] if not f["finished"] and (f["percent"] > 0 or f["fps"])]
+    for file_progress in active:
+        parts.append(f"{file_progress['name']} {file_progress['percent']:.0f}% "
+                     f"(ETA {format_eta(file_progress['eta'])})")
+    return " | ".join(parts)
@@ -0,0 +1,123 @@
+"""Fixed-point remap kernel for the numpy Superview engine.
+
+A plane is warped in bands of output rows. Superview only stretches
+horizontally, so every output pixel reads from one source row and its
+position is an integer source index plus a fractional column. Indices are
+precomputed once per size and crop; for linear interpolation the fraction
+is stored as an 8-bit fixed-point weight per output column, and a pixel is
+
+    (left * (256 - weight) + right * weight + 128) >> 8
+
+computed in one band's worth of uint16 scratch buffers per thread (workers
+processing files in parallel can share a kernel). Bands are small enough
+that their indices, scratch and source rows stay in cache, and they run on a
+thread pool: numpy releases the GIL inside take and the ufuncs, so bands run
+in parallel.
+
+"nearest" reproduces x.pgm / y.pgm: luma matches ffmpeg's remap filter,
+while chroma is point-sampled (ffmpeg remaps in 4:4:4 and downsamples
+afterwards, so U and V differ slightly). "linear" interpolates between the
+two nearest source columns.
+"""
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+INTERPOLATIONS = ("nearest", "linear")
+
+# Output rows per band
+BAND_ROWS = 32
+
+# Fixed-point scale of the column weights
+WEIGHT_ONE = 256
+
+
+def linear_index(columns, rows, plane_width, first, last):
+    """Source index and fixed-point weight for linear interpolation.
+
+    columns are fractional source columns per output column and rows the
+    source row per output row, in plane coordinates; first and last bound
+    the columns that may be read (the crop). Returns (flat index of the left
+    neighbour for every output pixel, weight of the right neighbour per
+    output column). The left neighbour is never the last column, so the
+    right one is always index + 1 in the same row.
+    """
+    columns = np.clip(np.asarray(columns, dtype=np.float64), first, last)
+    base = np.floor(columns).astype(np.intp)
+    weights = np.rint((columns - base) * WEIGHT_ONE).astype(np.uint16)
+    if last > first:
+        at_edge = base >= last
+        base[at_edge] = last - 1
+        weights[at_edge] = WEIGHT_ONE
+    index = np.asarray(rows, dtype=np.intp)[:, None] * plane_width + base[None, :]
+    return index.ravel(), weights
+
+
+class RemapKernel:
+    """Gather of one plane through a precomputed index, in bands of output rows"""
+
+    def __init__(self, index, out_width, out_height, weights=None, band_rows=BAND_ROWS):
+        self.index = np.ascontiguousarray(index, dtype=np.intp).reshape(-1)
+        self.out_width = out_width
+        self.out_height = out_height
+        self.weights = None
+        self.band_rows = band_rows
+        self.bands = [(start, min(start + band_rows, out_height)) for start in range(0, out_height, band_rows)]
+        self._local = threading.local()
+        if weights is not None:
+            self.weights = np.asarray(weights, dtype=np.uint16)
+            self.inverse = (WEIGHT_ONE - self.weights).astype(np.uint16)
+
+    def apply(self, source, out, executor=None, tasks=1):
+        """Warp source into out (both uint8 planes).
+
+        With an executor the bands are split into tasks runs of consecutive
+        bands, one per worker, so scheduling costs a few calls per plane
+        rather than one per band.
+        """
+        source = source.reshape(-1)
+        out = out.reshape(-1)
+        if executor is None or tasks < 2 or len(self.bands) == 1:
+            self._apply_bands(source, out, range(len(self.bands)))
+            return out
+        per_task = -(-len(self.bands) // tasks)
+        runs = [range(start, min(start + per_task, len(self.bands))) for start in range(0, len(self.bands), per_task)]
+        # Consuming the results re-raises any error from a band
+        for _ in executor.map(self._apply_bands, [source] * len(runs), [out] * len(runs), runs):
+            pass
+        return out
+
+    def _apply_bands(self, source, out, bands):
+        for band in bands:
+            self._apply_band(source, out, band)
+
+    def _scratch(self, rows):
+        """This thread's left, right, total and scaled buffers, cut to rows"""
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None:
+            shape = (self.band_rows, self.out_width)
+            scratch = self._local.scratch = (np.empty(shape, np.uint8), np.empty(shape, np.uint8),
+                                             np.empty(shape, np.uint16), np.empty(shape, np.uint16))
+        return [buffer[:rows] for buffer in scratch]
+
+    def _apply_band(self, source, out, band):
+        start_row, stop_row = self.bands[band]
+        start, stop = start_row * self.out_width, stop_row * self.out_width
+        index = self.index[start:stop]
+        # mode="clip" skips the bounds check and, unlike the default, writes into out without a temporary copy
+        if self.weights is None:
+            np.take(source, index, out=out[start:stop], mode="clip")
+            return
+
+        left, right, total, scaled = self._scratch(stop_row - start_row)
+        np.take(source, index, out=left.reshape(-1), mode="clip")
+        np.take(source[1:], index, out=right.reshape(-1), mode="clip")
+        np.multiply(left, self.inverse, out=total)
+        np.multiply(right, self.weights, out=scaled)
+        np.add(total, scaled, out=total)
+        np.add(total, WEIGHT_ONE // 2, out=total)
+        np.right_shift(total, 8, out=total)
+        np.copyto(out[start:stop].reshape(total.shape), total, casting="unsafe")
@@ -0,0 +1,111 @@
+"""Content-addressed cache of finished outputs.
+
+A result is keyed by a fingerprint of its source file(s) plus the settings
+that affect the output, so re-running a folder skips clips that were already
+processed the same way. Entries are hard-linked (or copied) in and out of the
+cache directory, and the least recently used entries are evicted when the
+cache grows beyond its size limit.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from atomic_file import temp_path_for
+
+# Blocks sampled from each source file for its fingerprint
+FINGERPRINT_SAMPLES = 16
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+
+
+def fingerprint(path, samples=FINGERPRINT_SAMPLES, block_size=FINGERPRINT_BLOCK_SIZE):
+    """Fast content fingerprint: file size plus a hash of evenly spaced blocks.
+
+    Reads at most samples * block_size bytes however large the file is. The
+    first and last blocks are always included since container headers and
+    indexes live there.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(size).encode())
+
+    with open(path, 'rb') as f:
+        if size <= samples * block_size:
+            digest.update(f.read())
+        else:
+            step = (size - block_size) / (samples - 1)
+            for i in range(samples):
+                f.seek(int(i * step))
+                digest.update(f.read(block_size))
+
+    return f"{size}-{digest.hexdigest()}"
+
+
+def link_or_copy(source, destination):
+    """Hard link source to destination, copying when linking is not possible"""
+    destination = Path(destination)
+    tmp_path = temp_path_for(destination, hidden=True)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copy2(source, tmp_path)
+    os.replace(tmp_path, destination)
+    # Renaming onto another link to the same file is a no-op that leaves the temporary name behind
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+
+
+class ResultCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def key(self, sources, options):
+        """Cache key for the output of processing sources with options"""
+        description = {
+            "sources": [fingerprint(path) for path in sources],
+            "options": options,
+        }
+        encoded = json.dumps(description, sort_keys=True).encode()
+        return hashlib.blake2b(encoded, digest_size=20).hexdigest()
+
+    def path_for(self, key, suffix):
+        return self.directory / f"{key}{suffix}"
+
+    def fetch(self, key, destination):
+        """Link a cached result to destination; returns False on a miss"""
+        path = self.path_for(key, Path(destination).suffix)
+        if not path.exists():
+            return False
+        link_or_copy(path, destination)
+        # Mark as recently used for eviction
+        os.utime(path)
+        return True
+
+    def store(self, key, result_file):
+        """Add a finished output to the cache and evict old entries if needed"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        link_or_copy(result_file, self.path_for(key, Path(result_file).suffix))
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.startswith('.'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
@@ -0,0 +1,136 @@
+"""Persistent index of scanned input folders.
+
+Re-scanning a large tree (e.g. a NAS share) with rglob costs a directory
+listing plus a stat for every entry. The index remembers, per directory, its
+modification time, the video files it contained (with size and mtime) and its
+subdirectories. A directory whose mtime has not changed is not listed again,
+so re-scanning an unchanged tree costs one stat per directory.
+
+Adding, removing or renaming an entry changes its directory's mtime; a file
+rewritten in place does not, so sizes and mtimes in the index can lag behind
+until something else changes in that directory. Files also carry a slot for
+probed metadata, which is only returned while their size and mtime match.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+
+from atomic_file import load_json, save_json
+
+INDEX_VERSION = 1
+
+# Directories modified this recently are listed again next time, since a
+# change within the filesystem's mtime resolution would otherwise go unseen
+MTIME_SETTLE_SECONDS = 2
+
+
+class ScanIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._dirs = {}
+        self._metadata = {}
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        data = load_json(self.path, INDEX_VERSION)
+        if data:
+            self._dirs = data.get("dirs", {})
+            self._metadata = data.get("metadata", {})
+
+    def save(self):
+        """Write the index if it changed, atomically"""
+        with self._lock:
+            if not self._dirty:
+                return
+            save_json(self.path, INDEX_VERSION, {"dirs": self._dirs, "metadata": self._metadata})
+            self._dirty = False
+
+    def scan(self, folder, extensions):
+        """Return (path, size, mtime) of every file under folder with one of the extensions.
+
+        Only directories whose mtime changed since the last scan are listed.
+        """
+        root = os.path.abspath(folder)
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f"Input folder does not exist: {folder}")
+
+        results = []
+        visited = set()
+        with self._lock:
+            pending = [root]
+            while pending:
+                directory = pending.pop()
+                visited.add(directory)
+                entry = self._directory_entry(directory)
+                if entry is None:
+                    continue
+                for name, (size, mtime) in entry["files"].items():
+                    if os.path.splitext(name)[1].lower() in extensions:
+                        results.append((os.path.join(directory, name), size, mtime))
+                pending.extend(os.path.join(directory, name) for name in entry["subdirs"])
+
+            # Forget directories and metadata under this root that no longer exist
+            prefix = root.rstrip(os.sep) + os.sep
+            for directory in list(self._dirs):
+                if (directory == root or directory.startswith(prefix)) and directory not in visited:
+                    del self._dirs[directory]
+                    self._dirty = True
+            found = {path for path, _, _ in results}
+            for path in list(self._metadata):
+                if path.startswith(prefix) and path not in found:
+                    del self._metadata[path]
+                    self._dirty = True
+
+        results.sort()
+        return results
+
+    def _directory_entry(self, directory):
+        """Cached listing of a directory, refreshed when its mtime changed"""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+
+        cached = self._dirs.get(directory)
+        if cached is not None and cached["mtime"] == mtime:
+            return cached
+
+        files = {}
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for item in entries:
+                    try:
+                        if item.is_dir(follow_symlinks=False):
+                            subdirs.append(item.name)
+                        elif item.is_file():
+                            stat = item.stat()
+                            files[item.name] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+
+        # A listing taken right after a change might miss a second change in the same mtime tick
+        settled = time.time() - mtime / 1e9 > MTIME_SETTLE_SECONDS
+        entry = {"mtime": mtime if settled else None, "files": files, "subdirs": sorted(subdirs)}
+        self._dirs[directory] = entry
+        self._dirty = True
+        return entry
+
+    def metadata(self, path, size, mtime):
+        """Probed metadata stored for a file, if its size and mtime still match"""
+        with self._lock:
+            cached = self._metadata.get(os.path.abspath(path))
+            if cached and cached["size"] == size and cached["mtime"] == mtime:
+                return cached["info"]
+        return None
+
+    def set_metadata(self, path, size, mtime, info):
+        """Store probed metadata for a file at its current size and mtime"""
+        with self._lock:
+            self._metadata[os.path.abspath(path)] = {"size": size, "mtime": mtime, "info": info}
+            self._dirty = True
@@ -0,0 +1,500 @@
+"""Superview remap tables.
+
+Superview stretches a 4:3 (or cropped) frame to 16:9 by leaving the centre
+of the image untouched and progressively stretching towards the edges.
+ffmpeg's remap filter does the actual warp; it takes two PGM images (x.pgm
+and y.pgm) that tell it, for every output pixel, which source pixel to read.
+The bundled x.pgm / y.pgm are the maps for a 988x720 source (1280x720 with
+the default 0:0:144:148 crop).
+
+Parsed or generated maps are stored in a binary cache (see RemapCache) and
+memory-mapped on later runs, so they are only ever computed once per size.
+ffmpeg is given binary (P5) 16-bit PGMs written from the cached arrays, so
+it reads them without parsing text; the ASCII bundled maps are only parsed
+once, into the cache.
+"""
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import metrics
+from atomic_file import atomic_write
+from frame_pool import FrameLayout, FramePool, run_frames
+from remap_kernel import INTERPOLATIONS, RemapKernel, linear_index
+
+# Source size the bundled x.pgm / y.pgm were generated for
+BUNDLED_SOURCE_SIZE = (988, 720)
+
+# Output aspect ratio of the warp
+ASPECT = (16, 9)
+
+
+def superview_size(width, height, aspect=ASPECT):
+    """Return the (width, height) of the 16:9 Superview output for a source size"""
+    out_width = int(height * (aspect[0] / aspect[1]))
+    out_width += out_width % 2  # encoders want even dimensions
+    return out_width, height
+
+
+def generate_maps(width, height, aspect=ASPECT):
+    """Generate the x and y remap tables for a source of the given size.
+
+    Returns (out_width, out_height, xmap, ymap) where the maps are flat lists in
+    row-major order. Same formula as niek/superview, so the bundled x.pgm and
+    y.pgm are reproduced exactly for a 988x720 source.
+    """
+    out_width, out_height = superview_size(width, height, aspect)
+    row = [min(max(int(column), 0), width - 1) for column in source_columns(width, height, aspect)]
+
+    xmap = row * out_height
+    ymap = [y for y in range(out_height) for _ in range(out_width)]
+    return out_width, out_height, xmap, ymap
+
+
+def source_columns(width, height, aspect=ASPECT):
+    """Exact (fractional, unclamped) source column of every output column; the x map truncates these"""
+    out_width, _ = superview_size(width, height, aspect)
+    half_diff = (out_width - width) / 2.0
+
+    columns = []
+    for x in range(out_width):
+        sx = x - half_diff
+        tx = (x / out_width - 0.5) * 2.0
+        offset = tx * tx * half_diff
+        if tx < 0:
+            offset *= -1
+        columns.append(sx - offset)
+    return columns
+
+
+def write_pgm(path, width, height, values):
+    """Write a flat sequence of values as a binary (P5) 16-bit PGM file, atomically"""
+    with atomic_write(path, 'wb') as f:
+        f.write(f"P5\n{width} {height}\n65535\n".encode("ascii"))
+        # PGM stores 16-bit samples most significant byte first
+        f.write(_uint16_bytes(values, "big"))
+
+
+def read_pgm(path):
+    """Read an ASCII (P2) or binary 16-bit (P5) PGM file, returning (width, height, values)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:2] == b"P5":
+        tokens = data.split(maxsplit=4)
+        width, height = int(tokens[1]), int(tokens[2])
+        pixels = tokens[4] if len(tokens) > 4 else b""
+        if len(pixels) < width * height * 2:
+            raise ValueError(f"Truncated PGM file: {path}")
+        values = array('H', pixels[:width * height * 2])
+        if sys.byteorder != 'big':
+            values.byteswap()
+        return width, height, list(values)
+    tokens = data.decode("ascii", errors="replace").split()
+    if not tokens or tokens[0] != "P2":
+        raise ValueError(f"Not a PGM file: {path}")
+    width, height = int(tokens[1]), int(tokens[2])
+    values = list(map(int, tokens[4:4 + width * height]))
+    if len(values) != width * height:
+        raise ValueError(f"Truncated PGM file: {path}")
+    return width, height, values
+
+
+def map_paths(directory, width, height):
+    """Names of the binary x/y PGM files for a source size (ASCII maps used plain x_WxH.pgm names)"""
+    directory = Path(directory)
+    return directory / f"x_{width}x{height}.p5.pgm", directory / f"y_{width}x{height}.p5.pgm"
+
+
+def write_maps(width, height, directory, maps=None):
+    """Write x/y remap PGM files for a source size into directory.
+
+    Returns (x_path, y_path). Files are named by source size so several
+    resolutions can share one directory, and are reused if already present.
+    maps is an already computed (out_width, out_height, xmap, ymap).
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    x_path, y_path = map_paths(directory, width, height)
+
+    if not (x_path.exists() and y_path.exists()):
+        out_width, out_height, xmap, ymap = maps or generate_maps(width, height)
+        for path, values in ((x_path, xmap), (y_path, ymap)):
+            write_pgm(path, out_width, out_height, values)
+
+    return str(x_path), str(y_path)
+
+
+class RemapCache:
+    """Binary, memory-mapped store of remap tables.
+
+    Each entry is one file holding a small header (magic, version, source and
+    output size, aspect) followed by the x and y maps as little-endian uint16
+    arrays. Entries are written once to a temporary name and renamed into
+    place, so concurrent workers can share the directory; readers map the file
+    read-only and share the pages through the OS cache.
+    """
+
+    MAGIC = b"SVMP"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHIIIIHH")
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def path_for(self, width, height, aspect=ASPECT):
+        out_width, out_height = superview_size(width, height, aspect)
+        return self.directory / (f"{width}x{height}-{out_width}x{out_height}"
+                                 f"-{aspect[0]}x{aspect[1]}-v{self.VERSION}.svmap")
+
+    def load(self, width, height, aspect=ASPECT):
+        """Return (out_width, out_height, xmap, ymap) from the cache, or None.
+
+        The maps are zero-copy views of the mapped file: NumPy arrays when
+        NumPy is available, otherwise uint16 memoryviews.
+        """
+        path = self.path_for(width, height, aspect)
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            magic, version, src_w, src_h, out_w, out_h, asp_w, asp_h = self.HEADER.unpack_from(mapped)
+        except struct.error:
+            mapped.close()
+            return None
+        count = out_w * out_h
+        if (magic != self.MAGIC or version != self.VERSION or (src_w, src_h) != (width, height)
+                or (asp_w, asp_h) != tuple(aspect)
+                or len(mapped) != self.HEADER.size + 4 * count):
+            mapped.close()
+            return None
+
+        offset = self.HEADER.size
+        if np is not None:
+            xmap = np.frombuffer(mapped, dtype='<u2', count=count, offset=offset)
+            ymap = np.frombuffer(mapped, dtype='<u2', count=count, offset=offset + 2 * count)
+        else:
+            view = memoryview(mapped)
+            xmap = view[offset:offset + 2 * count].cast('H')
+            ymap = view[offset + 2 * count:offset + 4 * count].cast('H')
+        return out_w, out_h, xmap, ymap
+
+    def store(self, width, height, maps, aspect=ASPECT):
+        """Write maps for a source size into the cache"""
+        out_width, out_height, xmap, ymap = maps
+        path = self.path_for(width, height, aspect)
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, width, height,
+                                  out_width, out_height, aspect[0], aspect[1])
+        with atomic_write(path, 'wb') as f:
+            f.write(header)
+            for values in (xmap, ymap):
+                f.write(_uint16_bytes(values))
+        return path
+
+
+def _uint16_bytes(values, byteorder="little"):
+    """Pack a sequence of map values as uint16 in the given byte order"""
+    if np is not None:
+        return np.asarray(values, dtype=('<u2' if byteorder == "little" else '>u2')).tobytes()
+    packed = array('H', values)
+    if sys.byteorder != byteorder:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def crop_filter_for(width, height, crop):
+    """Return (crop_width, crop_height, ffmpeg crop filter) for top:bottom:left:right"""
+    top, bottom, left, right = crop
+    crop_width, crop_height = width - left - right, height - top - bottom
+    if crop_width <= 0 or crop_height <= 0:
+        raise ValueError(f"Crop values {top}:{bottom}:{left}:{right} are larger than the video ({width}x{height})")
+    return crop_width, crop_height, f"crop={crop_width}:{crop_height}:{left}:{top}"
+
+
+def input_args(source):
+    """ffmpeg arguments that open a source: a file path, or a virtual input providing ffmpeg_args()"""
+    if hasattr(source, "ffmpeg_args"):
+        return source.ffmpeg_args()
+    return ["-i", str(source)]
+
+
+def _drain(stream, log, label):
+    """Forward lines from a child process stream to the log callback"""
+    for line in stream:
+        line = line.decode(errors='replace').strip() if isinstance(line, bytes) else line.strip()
+        if line and log:
+            log(f"{label}: {line}")
+    stream.close()
+
+
+class SuperviewEngine:
+    """In-process Superview warp driven by remap tables.
+
+    Maps are generated (or parsed from the bundled x.pgm / y.pgm) once per
+    source resolution, stored in the binary RemapCache and memory-mapped from
+    there on every later run. Two backends apply them:
+
+    - "ffmpeg": feed the maps to ffmpeg's remap filter (no Python per frame)
+    - "numpy": decode raw frames through a pipe, warp them with a vectorized
+      NumPy gather (see remap_kernel, with nearest or linear interpolation)
+      and pipe them to the encoder. A crop costs nothing here:
+      the gather reads straight from the uncropped frame, so cropping is
+      never a separate step (or a separate HandBrake encode). With nearest
+      interpolation the luma matches the ffmpeg backend; chroma is
+      point-sampled from the 4:2:0 planes, while ffmpeg remaps in 4:4:4 and
+      downsamples afterwards, so U and V differ slightly
+    """
+
+    BACKENDS = ("ffmpeg", "numpy")
+
+    def __init__(self, map_dir, bundled_dir=None, encoder_args=None, threads=0, log=None, interpolation="nearest"):
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"Unknown interpolation: {interpolation}")
+        self.map_dir = Path(map_dir)
+        self.cache = RemapCache(self.map_dir)
+        self.bundled_dir = Path(bundled_dir) if bundled_dir else Path(__file__).parent.absolute()
+        self.encoder_args = list(encoder_args) if encoder_args else ["-c:v", "libx264", "-crf", "20"]
+        self.threads = threads
+        self.log = log
+        self.interpolation = interpolation
+        self._maps = {}
+        self._indices = {}
+        # Workers processing files in parallel share one engine
+        self._lock = threading.RLock()
+
+    def maps(self, width, height):
+        """Return (out_width, out_height, xmap, ymap) for a source size, cached"""
+        key = (width, height)
+        with self._lock:
+            if key not in self._maps:
+                self._maps[key] = self._load_maps(width, height)
+            return self._maps[key]
+
+    def _load_maps(self, width, height):
+        """Load maps from the cache, building and storing them on a miss"""
+        maps = self.cache.load(width, height)
+        if maps is None:
+            if self._has_bundled(width, height):
+                out_width, out_height, xmap = read_pgm(self.bundled_dir / "x.pgm")
+                _, _, ymap = read_pgm(self.bundled_dir / "y.pgm")
+                maps = (out_width, out_height, xmap, ymap)
+            else:
+                maps = generate_maps(width, height)
+            try:
+                self.cache.store(width, height, maps)
+                maps = self.cache.load(width, height) or maps
+            except OSError as e:
+                if self.log:
+                    self.log(f"Could not write remap cache: {e}")
+        return maps
+
+    def _has_bundled(self, width, height):
+        """Whether the shipped x.pgm / y.pgm are the maps for this source size"""
+        return ((width, height) == BUNDLED_SOURCE_SIZE
+                and (self.bundled_dir / "x.pgm").exists()
+                and (self.bundled_dir / "y.pgm").exists())
+
+    def map_files(self, width, height):
+        """Return (x_path, y_path) binary PGM files for a source size, for ffmpeg's remap filter"""
+        x_path, y_path = map_paths(self.map_dir, width, height)
+        if x_path.exists() and y_path.exists():
+            return str(x_path), str(y_path)
+        with self._lock:
+            return write_maps(width, height, self.map_dir, maps=self.maps(width, height))
+
+    def ffmpeg_command(self, ffmpeg_path, input_file, output_file, width, height, crop=None):
+        """Build a single ffmpeg command that (crops and) warps a video.
+
+        crop is (top, bottom, left, right) applied to the width x height source
+        before the warp, in the same filter graph.
+        """
+        filters = "[0:v]"
+        if crop:
+            width, height, crop_filter = crop_filter_for(width, height, crop)
+            filters = f"[0:v]{crop_filter}[cropped];[cropped]"
+        x_map, y_map = self.map_files(width, height)
+
+        cmd = [
+            ffmpeg_path, "-hide_banner", "-y",
+            *input_args(input_file),
+            "-i", x_map,
+            "-i", y_map,
+            "-filter_complex", f"{filters}[1:v][2:v]remap,format=yuv420p[out]",
+            "-map", "[out]",
+            "-map", "0:a?",
+        ]
+        cmd += self.encoder_args
+        if self.threads:
+            cmd += ["-threads", str(self.threads)]
+        cmd += ["-c:a", "copy", str(output_file)]
+        return cmd
+
+    @staticmethod
+    def frame_pipeline_available():
+        """Whether frames can be cropped and warped in-process (numpy is installed)"""
+        return np is not None
+
+    def _gather_index(self, width, height, crop=None):
+        """Flat source pixel index for every output pixel, cached per size and crop.
+
+        The maps are those of the cropped size, offset into the uncropped
+        width x height frame, so the crop is folded into the warp.
+        """
+        top, _, left, _ = crop or (0, 0, 0, 0)
+        crop_width, crop_height = crop_filter_for(width, height, crop)[:2] if crop else (width, height)
+        key = (width, height, tuple(crop or ()))
+        with self._lock:
+            if key not in self._indices:
+                out_width, out_height, xmap, ymap = self.maps(crop_width, crop_height)
+                xmap = np.asarray(xmap, dtype=np.intp) + left
+                ymap = np.asarray(ymap, dtype=np.intp) + top
+                self._indices[key] = (out_width, out_height, ymap * width + xmap)
+            return self._indices[key]
+
+    def _plane_indices(self, width, height, crop=None):
+        """Gather indices for the Y plane and the half-resolution U and V planes of a 4:2:0 frame.
+
+        The chroma index is derived once per size and crop from the luma
+        one: the source pixel of every other output pixel on every other
+        row, halved into chroma coordinates.
+        """
+        key = ("yuv420p", width, height, tuple(crop or ()))
+        with self._lock:
+            if key not in self._indices:
+                out_width, out_height, luma = self._gather_index(width, height, crop)
+                source_y, source_x = np.divmod(luma.reshape(out_height, out_width)[::2, ::2], width)
+                chroma = (source_y // 2) * ((width + 1) // 2) + source_x // 2
+                self._indices[key] = (out_width, out_height, luma, chroma.ravel())
+            return self._indices[key]
+
+    def _linear_indices(self, width, height, crop=None):
+        """Left neighbour indices and fixed-point weights of the Y and U/V planes for linear interpolation"""
+        top, _, left, _ = crop or (0, 0, 0, 0)
+        crop_width, crop_height = crop_filter_for(width, height, crop)[:2] if crop else (width, height)
+        out_width, out_height = superview_size(crop_width, crop_height)
+        # The y map is the identity, so only columns have a fraction
+        columns = np.asarray(source_columns(crop_width, crop_height)) + left
+        rows = np.arange(out_height) + top
+        luma = linear_index(columns, rows, width, left, left + crop_width - 1)
+        chroma = linear_index(columns[::2] / 2, rows[::2] // 2, (width + 1) // 2,
+                              left // 2, (left + crop_width - 1) // 2)
+        return out_width, out_height, luma, chroma
+
+    def plane_kernels(self, width, height, crop=None):
+        """(out_width, out_height, Y kernel, U/V kernel) for a source size and crop, cached"""
+        key = ("kernels", self.interpolation, width, height, tuple(crop or ()))
+        with self._lock:
+            if key not in self._indices:
+                if self.interpolation == "linear":
+                    out_width, out_height, (luma, luma_weights), (chroma, chroma_weights) = \
+                        self._linear_indices(width, height, crop)
+                else:
+                    out_width, out_height, luma, chroma = self._plane_indices(width, height, crop)
+                    luma_weights = chroma_weights = None
+                chroma_width, chroma_height = (out_width + 1) // 2, (out_height + 1) // 2
+                self._indices[key] = (out_width, out_height,
+                                      RemapKernel(luma, out_width, out_height, luma_weights),
+                                      RemapKernel(chroma, chroma_width, chroma_height, chroma_weights))
+            return self._indices[key]
+
+    def warp_video(self, ffmpeg_path, input_file, output_file, width, height, fps, crop=None, warp=True,
+                   output=None):
+        """Crop and/or warp a video frame by frame in-process with the numpy backend.
+
+        One ffmpeg process decodes to raw YUV 4:2:0 on a pipe, frames are
+        remapped here plane by plane, and a second ffmpeg process encodes
+        them, taking audio from the original input. Staying in the encoder's
+        pixel format avoids two colour conversions per frame and moves 1.5
+        bytes per pixel instead of RGB's 3. Decoding, remapping and encoding
+        overlap, passing frames through fixed pools of reused buffers (see
+        frame_pool), and each plane is warped in row bands on a thread pool.
+        With a warp the crop is part of the gather indices;
+        without one (crop only) the cropped region of each plane is a view
+        of the decoded frame, copied once into an output buffer. As with
+        ffmpeg's crop filter, odd crop offsets are rounded down for chroma.
+
+        output(stream, label) consumes the encoder's stderr, which carries
+        its progress lines; by default each line is logged.
+        """
+        if np is None:
+            raise ImportError("numpy is required for the numpy Superview backend")
+
+        top, bottom, left, right = crop or (0, 0, 0, 0)
+        if warp:
+            out_width, out_height, luma, chroma = self.plane_kernels(width, height, crop)
+        else:
+            out_width, out_height, _ = crop_filter_for(width, height, (top, bottom, left, right))
+        input_pool = FramePool(FrameLayout(width, height, "yuv420p"))
+        output_pool = FramePool(FrameLayout(out_width, out_height, "yuv420p"))
+        # Region of each source plane kept by a crop-only pass
+        regions = []
+        for plane, (rows, columns) in enumerate(output_pool.layout.planes):
+            first_row, first_column = (top // 2, left // 2) if plane else (top, left)
+            regions.append((slice(first_row, first_row + rows), slice(first_column, first_column + columns)))
+
+        workers = self.threads or os.cpu_count() or 1
+        bands = ThreadPoolExecutor(max_workers=workers) if warp and workers > 1 else None
+
+        def transform(frame, out):
+            if warp:
+                luma.apply(frame.planes[0], out.planes[0], bands, workers)
+                chroma.apply(frame.planes[1], out.planes[1], bands, workers)
+                chroma.apply(frame.planes[2], out.planes[2], bands, workers)
+            else:
+                for source, target, region in zip(frame.planes, out.planes, regions):
+                    np.copyto(target, source[region])
+
+        thread_args = ["-threads", str(self.threads)] if self.threads else []
+        decode_cmd = [ffmpeg_path, "-hide_banner", "-v", "error", *thread_args, *input_args(input_file),
+                      "-f", "rawvideo", "-pix_fmt", "yuv420p", "pipe:1"]
+        encode_cmd = [ffmpeg_path, "-hide_banner", "-v", "error", "-stats", "-y",
+                      "-f", "rawvideo", "-pix_fmt", "yuv420p", "-s", f"{out_width}x{out_height}",
+                      "-r", str(fps), "-i", "pipe:0",
+                      *input_args(input_file),
+                      "-map", "0:v", "-map", "1:a?",
+                      *self.encoder_args, *thread_args, "-pix_fmt", "yuv420p",
+                      "-c:a", "copy", str(output_file)]
+
+        if self.log:
+            self.log(f"Running Superview decoder: {' '.join(decode_cmd)}")
+            self.log(f"Running Superview encoder: {' '.join(encode_cmd)}")
+            self.log(f"Frame buffers: {(input_pool.nbytes + output_pool.nbytes) / 1024 ** 2:.0f} MB")
+
+        decoder = subprocess.Popen(decode_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        encoder = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        drains = [threading.Thread(target=_drain, args=(decoder.stderr, self.log, "Decoder"), daemon=True),
+                  threading.Thread(target=output or (lambda stream, label: _drain(stream, self.log, label)),
+                                   args=(encoder.stderr, "ffmpeg"), daemon=True)]
+        for thread in drains:
+            thread.start()
+
+        try:
+            frames = run_frames(decoder.stdout, encoder.stdin, transform, input_pool, output_pool)
+        finally:
+            if bands is not None:
+                bands.shutdown()
+            encoder.stdin.close()
+            decoder.stdout.close()
+            metrics.wait(decoder)
+            metrics.wait(encoder)
+            for thread in drains:
+                thread.join()
+
+        if decoder.returncode != 0:
+            raise Exception(f"Decoder failed with return code {decoder.returncode}")
+        if encoder.returncode != 0:
+            raise Exception(f"Encoder failed with return code {encoder.returncode}")
+        return frames
@@ -0,0 +1,162 @@
+"""Watch-folder mode: process clips as they arrive in the input folder.
+
+The folder is polled through the scan index, so an idle poll costs one stat
+per directory. A new file is queued once its size and mtime have stayed the
+same for settle_seconds and it can be opened for reading (a file still being
+copied on Windows cannot). Queued files are processed one file per worker,
+with max_workers workers; the queue is kept in SQLite so nothing is lost or
+processed twice across restarts.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+
+from job_queue import JobQueue
+from pipeline import CropperviewPipeline, VIDEO_EXTENSIONS, open_scan_index
+
+# Name endings of files the pipeline writes (see CropperviewPipeline.generate_output_name)
+OUTPUT_SUFFIXES = ("-cropped", "-superview")
+
+
+def is_readable(path):
+    """Whether a file can be opened, i.e. no other process holds it exclusively"""
+    try:
+        with open(path, 'rb'):
+            return True
+    except OSError:
+        return False
+
+
+class FolderWatcher:
+    def __init__(self, folder, settings, log=None, script_dir=None):
+        self.folder = Path(folder).absolute()
+        self.settings = dict(settings)
+        self.log = log or (lambda message: None)
+        self.script_dir = Path(script_dir) if script_dir else Path(__file__).parent.absolute()
+
+        self.poll_seconds = self.settings["watch_poll_seconds"]
+        self.settle_seconds = self.settings["watch_settle_seconds"]
+        self.workers = max(1, self.settings["max_workers"])
+
+        self.index = open_scan_index(self.script_dir)
+        self.queue = JobQueue(self.script_dir / "cache" / "watch_queue.sqlite")
+        self.known = self.queue.known()
+        self.candidates = {}
+
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run(self):
+        """Poll and process until stop() is called or the process is interrupted"""
+        self.log(f"Watching {self.folder} with {self.workers} worker(s)")
+        threads = [threading.Thread(target=self.worker, args=(i,), daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.poll()
+                except FileNotFoundError as e:
+                    self.log(str(e))
+                self._stop.wait(self.poll_seconds)
+        finally:
+            self.stop()
+            for thread in threads:
+                thread.join()
+            self.queue.close()
+
+    def is_output(self, path):
+        """Skip results, partial outputs and temp files written into a watched tree.
+
+        The output folder may be the watched folder itself, so results are
+        recognised by name rather than by location.
+        """
+        path = Path(path)
+        if path.stem.endswith(OUTPUT_SUFFIXES) or (path.stem.startswith(".") and path.stem.endswith(".partial")):
+            return True
+        temp_folders = [self.settings["temp_folder"] or Path(self.settings["output_folder"]) / "temp"]
+        temp_folders.extend(self.settings["stage_temp_folders"].values())
+        for folder in temp_folders:
+            folder = Path(folder).absolute()
+            if folder == path.parent or folder in path.parents:
+                return True
+        return False
+
+    def poll(self):
+        """Queue new files that have finished being written"""
+        now = time.time()
+        seen = set()
+        for path, size, mtime in self.index.scan(self.folder, VIDEO_EXTENSIONS):
+            if (path, size, mtime) in self.known or self.is_output(path):
+                continue
+            # The index only refreshes a file's size when its directory changes, so stat it directly
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            key = (path, stat.st_size, stat.st_mtime_ns)
+            if key in self.known:
+                continue
+            seen.add(path)
+
+            candidate = self.candidates.get(path)
+            if candidate is None or candidate[0] != key:
+                self.candidates[path] = (key, now)
+                continue
+            if now - candidate[1] < self.settle_seconds or now - stat.st_mtime < self.settle_seconds:
+                continue
+            if not is_readable(path):
+                continue
+
+            if self.queue.enqueue(*key):
+                self.log(f"Queued: {os.path.basename(path)}")
+                self._wake.set()
+            self.known.add(key)
+            del self.candidates[path]
+
+        # Forget files that disappeared before they settled
+        for path in list(self.candidates):
+            if path not in seen:
+                del self.candidates[path]
+        self.index.save()
+
+    def worker(self, number):
+        temp_root = Path(self.settings["temp_folder"] or Path(self.settings["output_folder"]) / "temp")
+        temp_path = temp_root / f"watch{number + 1}"
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+
+            job_id, path = job
+            try:
+                self.process(path, temp_path)
+            except Exception as e:
+                if self._stop.is_set():
+                    break  # Interrupted; left running so it is queued again on the next start
+                self.log(f"Failed: {os.path.basename(path)}: {e}")
+                self.queue.fail(job_id, e)
+            else:
+                self.queue.finish(job_id)
+            self.remove_empty_folders(temp_path, temp_root)
+
+    def remove_empty_folders(self, *folders):
+        """Remove a worker's temp folders once a job leaves nothing in them, as a batch run does"""
+        for folder in folders:
+            try:
+                folder.rmdir()
+            except OSError:
+                pass  # Missing, still holds a failed job's files for resuming, or used by another worker
+
+    def process(self, path, temp_path):
+        settings = dict(self.settings, combine_videos=False, max_workers=1)
+        pipeline = CropperviewPipeline(settings, log=self.log, script_dir=self.script_dir)
+        pipeline.parallel_runs = self.workers
+        pipeline.run([path], temp_path=temp_path)